@@ -14,8 +14,7 @@ from .log import logger
 # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=
 # Imports from Splice package
 from .splice import __splice__
-from .splice.splice import SpliceMixin
-from .splice.identity import empty_taint
+from .splice.identity import set_current_user_taint, reset_current_user_taint
 # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
 
 def _create_transport_context(server_side, server_hostname):
@@ -441,6 +440,17 @@ class SSLProtocol(protocols.Protocol):
         # SSL-specific extra info. More info are set when the handshake
         # completes.
         self._extra = dict(sslcontext=sslcontext)
+        # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
+        # All application data received on this connection shares a single
+        # taint record, which the app protocol can get from its transport's
+        # get_extra_info('taint_region'). Only if __splice__ is set to be True.
+        # splicetypes is imported here, not at the top of the module: sslproto
+        # is imported (by base_events) before asyncio.Task, which splicetypes
+        # subclasses, exists.
+        if __splice__:
+            from .splice.splicetypes import SpliceTaintRegion
+            self._extra['taint_region'] = SpliceTaintRegion()
+        # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
 
         # App data write buffering
         self._write_backlog = collections.deque()
@@ -481,6 +491,21 @@ class SSLProtocol(protocols.Protocol):
         Start the SSL handshake.
         """
         self._transport = transport
+        # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
+        # self._sslpipe.feed_ssldata(data) would lose data's taint anyway,
+        # because it calls SSLObject's read() (in ssl.py), which calls a read()
+        # method implemented in C. So the connection's taint region takes the
+        # taint of the connection's socket once, and the socket's recv()
+        # returns plain bytes, so that no received chunk is ever wrapped in a
+        # Splice object. Only run this if __splice__ is set to be True.
+        if __splice__:
+            sock = transport.get_extra_info('socket')
+            # The transport may hand out a wrapper (trsock.TransportSocket).
+            sock = getattr(sock, '_sock', sock)
+            if hasattr(sock, 'use_plain_recv'):
+                sock.use_plain_recv()
+            self._extra['taint_region'].adopt(sock)
+        # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
         self._sslpipe = _SSLPipe(self._sslcontext,
                                  self._server_side,
                                  self._server_hostname)
@@ -532,19 +557,6 @@ class SSLProtocol(protocols.Protocol):
             return
 
         try:
-            # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-            # If data is tainted, we remember the taints for later use; otherwise,
-            # taints are set to be a default value (i.e., empty_taint()). Only run
-            # this part of the code if __splice__ is set to be True.
-            if __splice__:
-                taints = empty_taint()
-                trusted = False  # by default, data from network is not trusted
-                synthesized = False
-                if hasattr(data, 'taints'):
-                    taints = data.taints
-                    trusted = data.trusted
-                    synthesized = data.synthesized
-            # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
             ssldata, appdata = self._sslpipe.feed_ssldata(data)
         except (SystemExit, KeyboardInterrupt):
             raise
@@ -558,12 +570,11 @@ class SSLProtocol(protocols.Protocol):
         for chunk in appdata:
             if chunk:
                 # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-                # The method above self._sslpipe.feed_ssldata(data) loses data's taint,
-                # because feed_ssldata calls SSLObject's read() (in ssl.py) which calls
-                # a read() method implemented in C. We will add the taints back here to
-                # chunk. This is only necessary if __splice__ is set to be True.
+                # The app protocol handles the chunk on behalf of the connection's user,
+                # so Splice objects created in the callback take the user's taint from
+                # the (context-local) current user taint. Only if __splice__ is set.
                 if __splice__:
-                    chunk = SpliceMixin.to_splice(chunk, trusted, synthesized, taints, [])
+                    token = set_current_user_taint(self._extra['taint_region'].taints or None)
                 # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
                 try:
                     if self._app_protocol_is_buffer:
@@ -577,6 +588,11 @@ class SSLProtocol(protocols.Protocol):
                     self._fatal_error(
                         ex, 'application protocol failed to receive SSL data')
                     return
+                # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
+                finally:
+                    if __splice__:
+                        reset_current_user_taint(token)
+                # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
             else:
                 self._start_shutdown()
                 break
@@ -28,9 +28,8 @@ from .log import logger
 # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
 # Imports from Splice package
 from .splice import __splice__
-from .splice.splice import SpliceMixin
-from .splice.splicetypes import SplicePopen
-from .splice.identity import empty_taint
+from .splice.splicetypes import SplicePopen, SpliceTaintRegion
+from .splice.identity import empty_taint, set_current_user_taint, reset_current_user_taint
 # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
 
 __all__ = (
@@ -447,6 +446,15 @@ class _UnixReadPipeTransport(transports.ReadTransport):
     def __init__(self, loop, pipe, protocol, waiter=None, extra=None):
         super().__init__(extra)
         self._extra['pipe'] = pipe
+        # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
+        # Data from the pipe is tainted by the pipe if pipe is tainted. All data read
+        # from the pipe shares a single taint record, which the protocol can get from
+        # get_extra_info('taint_region'). Note that we *never* trust data read from
+        # the pipe, even if the pipe itself is trusted. Only if __splice__ is set.
+        if __splice__:
+            self._extra['taint_region'] = SpliceTaintRegion()
+            self._extra['taint_region'].adopt(pipe)
+        # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
         self._loop = loop
         self._pipe = pipe
         self._fileno = pipe.fileno()
@@ -498,26 +506,25 @@ class _UnixReadPipeTransport(transports.ReadTransport):
     def _read_ready(self):
         try:
             data = os.read(self._fileno, self.max_size)
-            # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-            # Data from the pipe is tainted by the pipe if pipe is tainted. Note that we
-            # *never* trust data read from the pipe, even if the pipe itself is trusted,
-            # However, this is only necessary if __splice__ is set to be True.
-            if __splice__:
-                taints = empty_taint()
-                trusted = False
-                synthesized = False
-                if hasattr(self._pipe, 'taints'):
-                    taints = self._pipe.taints
-                    synthesized = self._pipe.synthesized
-                data = SpliceMixin.to_splice(data, trusted, synthesized, taints, [])
-            # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
         except (BlockingIOError, InterruptedError):
             pass
         except OSError as exc:
             self._fatal_error(exc, 'Fatal read error on pipe transport')
         else:
             if data:
-                self._protocol.data_received(data)
+                # !!!SPLICE +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
+                # The protocol handles data on behalf of the user who taints the pipe,
+                # so Splice objects created in the callback take the user's taint from
+                # the (context-local) current user taint. Only if __splice__ is set.
+                if __splice__:
+                    token = set_current_user_taint(self._extra['taint_region'].taints or None)
+                    try:
+                        self._protocol.data_received(data)
+                    finally:
+                        reset_current_user_taint(token)
+                else:
+                    self._protocol.data_received(data)
+                # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
             else:
                 if self._loop.get_debug():
                     logger.info("%r was closed by peer", self)
@@ -0,0 +1,95 @@
+# This python script benchmarks batch deletion (see delete_users() in sstpd/deletion.py). It
+# deletes a number of users one at a time (one delete_user() call per user), then the same
+# users again in one batch, and reports the time of each phase. The heap is filled with a
+# configurable number of untainted containers, together with a fixed number of Splice objects
+# per user that must be synthesized and replaced (ints with interval constraints, which are
+# solved in closed form), and a few objects shared between two users, which only the batch
+# deletes (an object tainted by several users is deleted only if all of them are deleted).
+
+# Run the script from this directory in the Splice environment, where z3 is installed and the
+# splice package is available as asyncio.splice (the sstpd package is imported from the parent
+# directory).
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sstpd import deletion, replace
+from asyncio.splice.splicetypes import SpliceInt
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-u', '--users', help='number of users to delete', type=int, default=20)
+parser.add_argument('-o', '--objects', help='number of objects per user', type=int, default=200)
+parser.add_argument('-s', '--size', help='heap size (number of untainted containers)', type=int, default=10 ** 5)
+parser.add_argument('-b', '--backend', help='replacement backend', choices=replace.BACKENDS, default='gc')
+args = parser.parse_args()
+
+
+def interval(obj, dg=False):
+    return [{'gt': [1000], 'lt': [2000]}]
+
+
+def make_users(users, per_user):
+    """Return a list of lists of Splice objects, one per user, and a few objects shared by two users."""
+    held = [[SpliceInt(i, trusted=False, taints=taint, constraints=interval) for i in range(per_user)]
+            for taint in users]
+    held.append([SpliceInt(i, trusted=False, taints=users[i] | users[i + 1], constraints=interval)
+                 for i in range(len(users) - 1)])
+    return held
+
+
+def phase_timer(times):
+    """Return an on_progress callback that adds the time spent in each phase to times."""
+    last = []
+
+    def on_progress(job):
+        now = time.perf_counter()
+        if last:
+            times[last[0]] = times.get(last[0], 0.0) + now - last[1]
+        last[:] = [job.phase, now]
+    return on_progress
+
+
+async def one_at_a_time(users):
+    times = dict()
+    on_progress = phase_timer(times)
+    for taint in users:
+        await deletion.delete_user(taint, logging, on_progress=on_progress)
+    return times
+
+
+async def batch(users):
+    times = dict()
+    await deletion.delete_users(users, logging, on_progress=phase_timer(times))
+    return times
+
+
+if __name__ == '__main__':
+    replace.set_backend(args.backend)
+    filler = [[i] if i % 2 else {'k': i} for i in range(args.size)]
+    users = [1 << i for i in range(args.users)]
+    loop = asyncio.get_event_loop()
+    # Start the synthesis workers before timing.
+    warm_up = SpliceInt(0, trusted=False, taints=1 << args.users, constraints=interval)
+    loop.run_until_complete(deletion.delete_user(1 << args.users, logging))
+    results = dict()
+    for name, run in (('one at a time', one_at_a_time), ('batch', batch)):
+        held = make_users(users, args.objects)
+        start = time.perf_counter()
+        times = loop.run_until_complete(run(users))
+        results[name] = (time.perf_counter() - start, times)
+        del held
+    deletion.shutdown_executor()
+    phases = [phase for phase in deletion.DeletionJob.PHASES
+              if phase != 'done' and any(phase in times for _, times in results.values())]
+    print('{:>14} {:>11}'.format('mode', 'total (ms)') + ''.join(' {:>11}'.format(phase) for phase in phases))
+    for name, (total, times) in results.items():
+        print('{:>14} {:>11.1f}'.format(name, total * 1000)
+              + ''.join(' {:>11.1f}'.format(times.get(phase, 0.0) * 1000) for phase in phases))
+    print('\nDeleting {} users in one batch is {:.1f}x faster than one at a time.'.format(
+        args.users, results['one at a time'][0] / results['batch'][0]))
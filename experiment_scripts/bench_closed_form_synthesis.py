@@ -0,0 +1,107 @@
+# This python script benchmarks closed-form synthesis (see closed_form_synthesis() in
+# sstpd/synthesis.py) against synthesis with Z3. It generates a mix of constraint sets in
+# the shapes we see during Splice deletion (int and float intervals, one- and two-sided
+# string bounds, and datetime intervals), together with sets that must go to Z3 (custom
+# 'eq' functions and conflicting bounds). It reports the fraction of sets solved in closed
+# form and the speedup over solving every set with Z3.
+
+# Run the script from this directory in the Splice environment, where z3 is installed and
+# the splice package is available as asyncio.splice (the sstpd package is imported from
+# the parent directory). The synthesis cache is disabled so that every set is solved.
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sstpd.synthesis import Synthesizer, IntSynthesizer, FloatSynthesizer, StrSynthesizer, \
+    DatetimeSynthesizer, synthesis_cache, synthesis_stats
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--number', help='number of constraint sets per shape', type=int, default=200)
+parser.add_argument('-r', '--repeat', help='number of runs', type=int, default=3)
+parser.add_argument('-s', '--seed', help='random seed', type=int, default=0)
+args = parser.parse_args()
+
+CHARS = StrSynthesizer.DEFAULT_ASCII_CHARS
+
+
+def random_str(length):
+    return ''.join(random.choice(CHARS[16:]) for _ in range(length))
+
+
+def make_shapes(n):
+    """Return a dict of shape name -> (synthesizer class, list of constraints lists)."""
+    shapes = dict()
+    ints = []
+    for _ in range(n):
+        lower = random.randint(-10 ** 6, 10 ** 6)
+        ints.append([{'gt': [lower], 'lt': [lower + random.randint(2, 1000)]}])
+    shapes['int interval'] = (IntSynthesizer, ints)
+    floats = []
+    for _ in range(n):
+        lower = random.uniform(-10 ** 6, 10 ** 6)
+        floats.append([{'ge': [lower], 'lt': [lower + random.uniform(1, 1000)]}])
+    shapes['float interval'] = (FloatSynthesizer, floats)
+    strs = []
+    for _ in range(n):
+        lower, upper = sorted([random_str(random.randint(1, 12)), random_str(random.randint(1, 12))])
+        strs.append([{'gt': [lower], 'lt': [upper]}] if lower != upper else [{'gt': [lower]}])
+    shapes['str bounded'] = (StrSynthesizer, strs)
+    shapes['str one-sided'] = (StrSynthesizer, [[{'gt': [random_str(random.randint(1, 12))]}] for _ in range(n)])
+    dts = []
+    for _ in range(n):
+        # Z3 bounds datetime values by their timestamps
+        lower = datetime(2021, 1, 1) + timedelta(seconds=random.randint(0, 10 ** 7))
+        upper = lower + timedelta(hours=random.randint(1, 100))
+        dts.append([{'gt': [lower.timestamp()], 'lt': [upper.timestamp()]}])
+    shapes['datetime interval'] = (DatetimeSynthesizer, dts)
+
+    def shift(x, *, n):
+        return x + n
+
+    shapes['int eq (Z3)'] = (IntSynthesizer, [[{'eq': [(shift, random.randint(0, 1000))], 'gt': [0]}]
+                                              for _ in range(n)])
+    shapes['int conflicting (Z3)'] = (IntSynthesizer, [[{'gt': [5], 'lt': [6]}] for _ in range(n)])
+    return shapes
+
+
+def run(synthesizer_cls, constraints_lists, closed_form):
+    Synthesizer.closed_form = closed_form
+    synthesizer = synthesizer_cls()
+    start = time.perf_counter()
+    for constraints_list in constraints_lists:
+        synthesizer.splice_synthesis(constraints_list)
+    return time.perf_counter() - start
+
+
+def best_of(synthesizer_cls, constraints_lists, closed_form, repeat):
+    return min(run(synthesizer_cls, constraints_lists, closed_form) for _ in range(repeat))
+
+
+if __name__ == '__main__':
+    random.seed(args.seed)
+    synthesis_cache.maxsize = 0
+    shapes = make_shapes(args.number)
+    print('{:>22} {:>12} {:>14} {:>12} {:>10}'.format('shape', 'Z3 (ms)', 'closed (ms)', 'speedup', 'hit rate'))
+    total_z3, total_closed, total_hits, total_sets = 0.0, 0.0, 0, 0
+    for name, (synthesizer_cls, constraints_lists) in shapes.items():
+        z3_time = best_of(synthesizer_cls, constraints_lists, False, args.repeat)
+        synthesis_stats['closed_form'], synthesis_stats['solver'] = 0, 0
+        closed_time = run(synthesizer_cls, constraints_lists, True)
+        hits = synthesis_stats['closed_form']
+        closed_time = min(closed_time, best_of(synthesizer_cls, constraints_lists, True, args.repeat - 1)) \
+            if args.repeat > 1 else closed_time
+        total_z3 += z3_time
+        total_closed += closed_time
+        total_hits += hits
+        total_sets += len(constraints_lists)
+        print('{:>22} {:>12.2f} {:>14.2f} {:>11.1f}x {:>9.1%}'.format(name, z3_time * 1000, closed_time * 1000,
+                                                                  z3_time / closed_time,
+                                                                  hits / len(constraints_lists)))
+    print('{:>22} {:>12.2f} {:>14.2f} {:>11.1f}x {:>9.1%}'.format('total', total_z3 * 1000, total_closed * 1000,
+                                                              total_z3 / total_closed, total_hits / total_sets))
@@ -0,0 +1,86 @@
+# This python script benchmarks the replacement phase of Splice deletion with the two backends
+# in sstpd/replace.py that find the references to the objects to be replaced: guppy, which
+# walks the entire heap (hp.iso().pathsin), and gc, which asks gc.get_referrers() and only
+# inspects the containers that can hold Splice objects. The heap is filled with a configurable
+# number of untainted containers, together with a fixed number of Splice objects referenced
+# from lists, dicts (as values and as keys), sets, instance attributes, and closure cells.
+
+# Run the script from this directory (the splice package is imported from the parent directory
+# and replace from sstpd/). guppy (guppy3) must be installed.
+
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'sstpd'))
+
+import replace
+from splice.splicetypes import SpliceStr
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-s', '--sizes', help='heap sizes (number of untainted containers)', type=int, nargs='+',
+                    default=[10 ** 4, 10 ** 5, 10 ** 6])
+parser.add_argument('-o', '--objects', help='number of objects to replace', type=int, default=100)
+parser.add_argument('-r', '--repeat', help='number of runs per heap size', type=int, default=3)
+args = parser.parse_args()
+
+
+class Holder(object):
+    def __init__(self, value):
+        self.value = value
+
+
+def make_holders(n):
+    """Create n Splice objects and containers that refer to them; return (pairs, check)."""
+    olds = [SpliceStr('old-%d' % i) for i in range(n)]
+    news = [SpliceStr('new-%d' % i) for i in range(n)]
+    in_list = list(olds)
+    in_dict = {i: old for i, old in enumerate(olds)}
+    as_keys = {old: i for i, old in enumerate(olds)}
+    in_set = set(olds)
+    holders = [Holder(old) for old in olds]
+    cells = [(lambda old: (lambda: old))(old) for old in olds]
+    new_ids = {id(new) for new in news}
+
+    def check():
+        """Return the number of references that still point to an old object."""
+        values = (in_list + list(in_dict.values()) + list(as_keys) + list(in_set)
+                  + [h.value for h in holders] + [f() for f in cells])
+        return sum(1 for v in values if id(v) not in new_ids)
+    pairs = list(zip(olds, news))
+    del olds, news
+    return pairs, check
+
+
+def run(backend, n):
+    replace.set_backend(backend)
+    pairs, check = make_holders(n)
+    start = time.perf_counter()
+    failed = replace.replace_many(pairs)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(failed), check()
+
+
+if __name__ == '__main__':
+    print('{:>12} {:>14} {:>14} {:>9} {:>18}'.format('heap size', 'guppy (ms)', 'gc (ms)', 'speedup',
+                                                   'stale refs (g/gc)'))
+    filler = []
+    for size in sorted(args.sizes):
+        while len(filler) < size:
+            i = len(filler)
+            filler.append([i] if i % 2 else {'k': i})
+        results = dict()
+        for backend in replace.BACKENDS:
+            times, stale = [], 0
+            for _ in range(args.repeat):
+                elapsed, failed, left = run(backend, args.objects)
+                times.append(elapsed)
+                stale = max(stale, left + failed)
+            results[backend] = (min(times), stale)
+        (guppy_time, guppy_stale), (gc_time, gc_stale) = results['guppy'], results['gc']
+        print('{:>12,} {:>14.2f} {:>14.2f} {:>8.1f}x {:>18}'.format(size, guppy_time * 1000, gc_time * 1000,
+                                                                   guppy_time / gc_time,
+                                                                   '{}/{}'.format(guppy_stale, gc_stale)))
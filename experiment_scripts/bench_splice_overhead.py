@@ -0,0 +1,160 @@
+# This python script benchmarks the overhead of Splice on the SSTP relay data path and attributes
+# it with the Splice profiler (splice/profiler.py). A client sends SSTP data packets over a TCP
+# loopback connection to a relay server, which reassembles the packets from its receive buffer
+# the same way SSTPProtocol.sstp_data_received() does and relays every payload back (as pppd
+# would). The same workload runs with __splice__ off (plain sockets) and on (the server listens
+# on a SpliceSocket, so every connection and every chunk it receives is tainted), each in its own
+# process so that CPU time and peak memory are measured separately. The splice run is repeated
+# with the profiler enabled to show which Splice classes and methods the difference comes from.
+
+# With --data-plane region (the default), the connection's SpliceTaintRegion takes the taint of
+# the connection's socket once, and the socket receives plain bytes (see SSLProtocol in
+# asyncio/sslproto.py), as sstpd does in splice mode. With --data-plane
+# tainted, the receive buffer is a SpliceBytearray and parsing goes through Splice objects.
+
+# Run the script from this directory (the splice package is imported from the parent directory).
+
+import os
+import sys
+import json
+import time
+import struct
+import asyncio
+import argparse
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import splice
+from splice import profiler
+from splice.splicetypes import SpliceSocket, SpliceBytearray, SpliceTaintRegion
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--packets', help='number of packets to relay', type=int, default=20000)
+parser.add_argument('-p', '--payload', help='payload size of a packet in bytes', type=int, default=1400)
+parser.add_argument('-d', '--data-plane', help='how the server handles tainted data in splice mode',
+                    choices=('region', 'tainted'), default='region')
+parser.add_argument('-t', '--top', help='number of profiled methods to report', type=int, default=15)
+# Used internally to run one mode in a child process
+parser.add_argument('--run', choices=('baseline', 'splice', 'profile'), help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+__splice__ = False
+
+
+def parse_length(s):
+    return ((s[0] & 0x0f) << 8) + s[1]  # Ignore R
+
+
+class RelayProtocol(asyncio.Protocol):
+    """The SSTP data path of the server: reassemble packets and relay their payloads."""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.sstp_packet_len = 0
+        self.receive_buf = bytearray()
+        self.taint_region = None
+        if __splice__:
+            if args.data_plane == 'region':
+                self.taint_region = SpliceTaintRegion()
+                sock = transport.get_extra_info('socket')
+                sock = getattr(sock, '_sock', sock)
+                sock.use_plain_recv()
+                self.taint_region.adopt(sock)
+            else:
+                self.receive_buf = SpliceBytearray()
+
+    def data_received(self, data):
+        self.receive_buf.extend(data)
+        while len(self.receive_buf) >= 4:
+            if not self.sstp_packet_len:
+                self.sstp_packet_len = parse_length(self.receive_buf[2:4])
+            if len(self.receive_buf) < self.sstp_packet_len:
+                return
+            packet = self.receive_buf[:self.sstp_packet_len]
+            self.receive_buf = self.receive_buf[self.sstp_packet_len:]
+            self.sstp_packet_len = 0
+            self.transport.write(packet[4:])
+
+
+async def client(port, packets, payload):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    packet = struct.pack('!BBH', 0x10, 0, len(payload) + 4) + payload
+    expected = len(payload) * packets
+
+    async def receive():
+        received = 0
+        while received < expected:
+            received += len(await reader.read(1 << 16))
+
+    receiving = asyncio.ensure_future(receive())
+    for i in range(packets):
+        writer.write(packet)
+        if i % 64 == 63:
+            await writer.drain()
+    await writer.drain()
+    await receiving
+    writer.close()
+
+
+async def relay(packets, payload):
+    loop = asyncio.get_event_loop()
+    # As in sstpd/__main__.py, the server socket is a SpliceSocket in splice mode.
+    sock = SpliceSocket() if __splice__ else None
+    if sock is not None:
+        sock.bind(('127.0.0.1', 0))
+        server = await loop.create_server(RelayProtocol, sock=sock)
+    else:
+        server = await loop.create_server(RelayProtocol, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    await client(port, packets, payload)
+    server.close()
+    await server.wait_closed()
+
+
+def run_mode(mode):
+    """Run the workload in this process and print its measurements as JSON."""
+    global __splice__
+    __splice__ = splice.__splice__ = mode != 'baseline'
+    if mode == 'profile':
+        profiler.enable()
+    start, cpu = time.perf_counter(), time.process_time()
+    asyncio.get_event_loop().run_until_complete(relay(args.packets, os.urandom(args.payload)))
+    result = {'wall': time.perf_counter() - start, 'cpu': time.process_time() - cpu,
+              'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if mode == 'profile':
+        profiler.disable()
+        result['totals'] = profiler.totals()
+        result['report'] = profiler.report(args.top)
+    print(json.dumps(result))
+
+
+def spawn(mode):
+    command = [sys.executable, os.path.abspath(__file__), '--run', mode, '-n', str(args.packets),
+               '-p', str(args.payload), '-d', args.data_plane, '-t', str(args.top)]
+    return json.loads(subprocess.check_output(command).decode().strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    if args.run:
+        run_mode(args.run)
+        sys.exit(0)
+    baseline, spliced, profiled = spawn('baseline'), spawn('splice'), spawn('profile')
+    print('{:>10} {:>11} {:>11} {:>13}'.format('mode', 'wall (ms)', 'CPU (ms)', 'max RSS (KB)'))
+    for name, result in (('baseline', baseline), ('splice', spliced)):
+        print('{:>10} {:>11.1f} {:>11.1f} {:>13}'.format(name, result['wall'] * 1000, result['cpu'] * 1000,
+                                                        result['maxrss']))
+    difference = spliced['cpu'] - baseline['cpu']
+    print('\nSplice costs {:.1f} ms of CPU ({:+.1%}) for {} packets of {} bytes.'.format(
+        difference * 1000, difference / baseline['cpu'], args.packets, args.payload))
+    totals = profiled['totals']
+    print('\nProfiled splice run ({:.1f} ms of CPU, including the profiler\'s overhead):'.format(
+        profiled['cpu'] * 1000))
+    print('  wrapper invocations:              {:>10}'.format(totals['calls']))
+    print('  objects created (MetaSplice):     {:>10}'.format(totals['created']))
+    print('  time in wrappers and creation:    {:>10.1f} ms'.format(totals['own'] * 1000))
+    for name in profiler.HELPERS:
+        print('    {:<32}{:>10.1f} ms'.format(name, totals[name] * 1000))
+    print()
+    print(profiled['report'])
@@ -1,28 +1,36 @@
-# This python script simulates a client sends a Splice deletion request to the SSTP server,
-# so that we do not need to modify the sstpc client application. To delete a specific client,
-# we need to know its unique taint value (this will be printed out in the server console
-# when a client is connected to the server). Use this taint value (which should be an int) as
-# the argument to run this script for Splice deletion.
+# This python script sends a Splice deletion request to the admin socket of the SSTP server
+# (see sstpd/admin.py). To delete a specific client, we need to know its unique taint value
+# (this will be printed out in the server console when a client is connected to the server).
+# Use this taint value (which should be an int) as the argument to run this script for Splice
+# deletion. Several taint values can be given to delete several clients in one request: they are
+# deleted in one batch, and the final statistics are also reported per client.
 
-# We assume the SSTP server is at 172.19.0.2. We also assume the existence of cert.pem in the
-# parent directory (note that SSL is a must to run this client properly). However, these are
-# arguments to this script that can be changed if needed.
+# The admin socket is a unix socket, so this script must run on the server's host. In the
+# deletion experiment, the server runs in the sstp-server-del container with the admin socket
+# at /tmp/sstpd-admin.sock (see sstp-server-docker.ini), so run e.g.:
+#   docker exec -i sstp-server-del python3.8 - -t <TAINT> < send_deletion_request.py
+# The script prints the server's progress events and final statistics as they arrive.
 
+import json
 import socket
-import ssl
 import argparse
 
 parser = argparse.ArgumentParser()
-parser.add_argument('-H', '--host', help='SSTP server IP', default='172.19.0.2')
-parser.add_argument('-p', '--port', help='SSTP server port', type=int, default=443)
-parser.add_argument('-c', '--certs', help='path to certificate', default='../cert.pem')
-parser.add_argument('-t', '--taint', help='taint ID of the user to be deleted', type=int, required=True)
+parser.add_argument('-s', '--socket', help='path of the admin socket', default='/tmp/sstpd-admin.sock')
+parser.add_argument('-t', '--taint', help='taint ID of the user to be deleted', type=int, nargs='+',
+                    required=True)
+parser.add_argument('-a', '--audit', help='audit the deletion and report survivors', action='store_true')
 args = parser.parse_args()
 
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-    with ssl.wrap_socket(s, cert_reqs=ssl.CERT_REQUIRED, ca_certs=args.certs) as ssock:
-        ssock.connect((args.host, args.port))
-        # Send a simple SPLICE deletion request with taint
-        ssock.sendall(bytes('SPLICE:{}'.format(args.taint), 'utf8'))
-        data = ssock.recv(1024)
-print('Response from the SSTP server:{}'.format(data))
+with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+    s.connect(args.socket)
+    request = {'delete': args.taint}
+    if args.audit:
+        request['audit'] = True
+    s.sendall(json.dumps(request).encode() + b'\n')
+    with s.makefile('rb') as replies:
+        for line in replies:
+            event = json.loads(line.decode())
+            print('Response from the SSTP server: {}'.format(event))
+            if event['event'] in ('done', 'error'):
+                break
@@ -1,4 +1,10 @@
 import ipaddress
+import heapq
+import contextvars
+from contextlib import contextmanager
+
+from .registry import taint_registry
+
 MAX_USERS = 63
 
 
@@ -8,24 +14,49 @@ def empty_taint():
 
 class TaintSource(object):
     """Track everything about user taints."""
-    MAX_USERS = MAX_USERS  # Maximum number of user allowed
-    current_user_id = None
-    current_user_taint = empty_taint()
+    MAX_USERS = MAX_USERS  # Maximum number of user allowed (for get_taint_from_id() only)
+    # The taint of the user on whose behalf the current context runs (e.g.,
+    # while the event loop dispatches a tainted connection's callback). It
+    # is context-local, so concurrent connections never see each other's
+    # taint. None means no user scope is active.
+    current_user_taint = contextvars.ContextVar('current_user_taint', default=None)
+    # Taint bits allocated at connection time: key (e.g., address) -> taint
+    allocated_taints = dict()
+    # Bit positions released on disconnect, waiting to be recycled (a min-heap)
+    released_positions = []
+    # The lowest bit position that has never been allocated
+    next_position = 0
 
 
-def set_current_user_id(uid):
-    TaintSource.current_user_id = uid
-    set_taint_from_id(uid)
+def set_current_user_taint(taint):
+    """Set the current user taint in this context and return a token to reset it."""
+    return TaintSource.current_user_taint.set(taint)
 
 
-def set_current_user_taint(taint):
-    TaintSource.current_user_taint = taint
+def reset_current_user_taint(token):
+    """Restore the current user taint to its value before set_current_user_taint() returned token."""
+    TaintSource.current_user_taint.reset(token)
 
 
-def set_taint_from_id(uid):
-    pos = uid % TaintSource.MAX_USERS
-    taint = 1 << pos
-    set_current_user_taint(taint)
+def get_current_user_taint():
+    """Return the current user taint in this context, or None if no user scope is active."""
+    return TaintSource.current_user_taint.get()
+
+
+@contextmanager
+def taint_scope(taint):
+    """
+    Run the with-block on behalf of the user with taint. Splice objects
+    created in the block take the scope's taint directly, instead of
+    the union of the taints of their arguments. An empty taint runs the
+    block outside of any user scope (objects are then tainted by their
+    arguments as usual), e.g., for Splice's own deletion code.
+    """
+    token = set_current_user_taint(taint or None)
+    try:
+        yield
+    finally:
+        reset_current_user_taint(token)
 
 
 # For int taint only
@@ -34,14 +65,59 @@ def get_taint_from_id(uid):
     return 1 << pos
 
 
+def allocate_taint(key):
+    """
+    Return the taint allocated to key (e.g., a client address), allocating a
+    new taint bit if key has none. Each key gets its own bit, so taints never
+    collide no matter how many users are connected. We always hand out the
+    lowest bit available so that taints stay small integers (CPython ints are
+    already compact bitmaps, so a union of taints is a plain "|" however many
+    users there are). A released bit is recycled only if no live object still
+    carries it; otherwise a deletion request for the new owner of the bit would
+    erase the previous owner's objects as well.
+    """
+    taint = TaintSource.allocated_taints.get(key)
+    if taint is not None:
+        return taint
+    # Bits still in use are put back after we find a free one.
+    busy = []
+    position = None
+    while TaintSource.released_positions:
+        candidate = heapq.heappop(TaintSource.released_positions)
+        if taint_registry.has_objects(1 << candidate):
+            busy.append(candidate)
+        else:
+            position = candidate
+            break
+    for candidate in busy:
+        heapq.heappush(TaintSource.released_positions, candidate)
+    if position is None:
+        position = TaintSource.next_position
+        TaintSource.next_position += 1
+    taint = 1 << position
+    TaintSource.allocated_taints[key] = taint
+    return taint
+
+
+def release_taint(key):
+    """Release the taint bit allocated to key (e.g., on disconnect) so that it can be recycled."""
+    taint = TaintSource.allocated_taints.pop(key, None)
+    if taint is not None:
+        heapq.heappush(TaintSource.released_positions, taint.bit_length() - 1)
+
+
 def taint_id_from_addr(address):
     # address is a tuple (ip, port) # FIXME: this is specific to TCP
-    # TODO: a better way to assign taint
-    taint = get_taint_from_id(int(ipaddress.IPv4Address(address[0])) + address[1])
+    taint = allocate_taint((str(ipaddress.ip_address(address[0])), address[1]))
     print("[splice] socket {} is tainted by ID: {}".format(address, taint))
     return taint
 
 
+def release_taint_from_addr(address):
+    """Release the taint allocated by taint_id_from_addr() when the client at address disconnects."""
+    release_taint((str(ipaddress.ip_address(address[0])), address[1]))
+
+
 def to_int(taint):
     return taint
 
@@ -0,0 +1,190 @@
+"""
+Opt-in profiler for the Splice runtime. It attributes the cost of Splice to
+Splice classes and their methods. Per (class, method), it counts:
+
+- invocations of the wrappers that to_splice_cls() puts around methods;
+- time spent in contains_untrusted_arguments(), union_argument_taints()
+  and copy.copy() from within those wrappers;
+- objects created through MetaSplice.__call__ (as method '__call__').
+
+The profiler costs nothing until it is enabled: enable() swaps profiling
+versions of the wrappers, the helpers and MetaSplice.__call__ in, and
+disable() swaps the originals back. Usage:
+
+    from splice import profiler
+    with profiler.profiling():
+        ...
+    print(profiler.report())
+
+Time is measured with time.perf_counter() and includes the profiler's own
+overhead, so compare figures between runs, not with unprofiled runs.
+"""
+import copy
+import types
+import functools
+from time import perf_counter
+from contextlib import contextmanager
+
+from . import splice
+from .splice import MetaSplice, SpliceMixin
+
+# Helpers whose time is measured. copy.copy() is called by the wrappers
+# of methods of mutable classes to detect in-place updates of "self".
+HELPERS = ('contains_untrusted_arguments', 'union_argument_taints', 'copy.copy')
+
+# Key for helper calls made outside any wrapper or object creation
+OUTSIDE = ('-', '-')
+
+
+class MethodStats(object):
+    """Statistics of one method of one Splice class."""
+    __slots__ = ('calls', 'total', 'own', 'helpers')
+
+    def __init__(self):
+        self.calls = 0
+        # Time spent in the method, including (total)
+        # and excluding (own) nested profiled calls.
+        self.total = 0.0
+        self.own = 0.0
+        self.helpers = dict.fromkeys(HELPERS, 0.0)
+
+
+# (class name, method name) -> MethodStats
+stats = dict()
+# Stack of [key, time spent in nested profiled calls]
+# of the profiled calls being executed.
+_stack = []
+# (owner, attribute name, original value) of everything swapped in by
+# enable(), in order, or None if the profiler is not enabled.
+_saved = None
+
+
+def _stats(key):
+    entry = stats.get(key)
+    if entry is None:
+        entry = stats[key] = MethodStats()
+    return entry
+
+
+def _profiled(key, func):
+    """Return func counted and timed as the method key."""
+    @functools.wraps(func)
+    def profiled(*args, **kwargs):
+        entry = _stats(key)
+        entry.calls += 1
+        frame = [key, 0.0]
+        _stack.append(frame)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            _stack.pop()
+            entry.total += elapsed
+            entry.own += elapsed - frame[1]
+            if _stack:
+                _stack[-1][1] += elapsed
+    return profiled
+
+
+def _timed(name, func):
+    """Return the helper func timed and attributed to the profiled call being executed."""
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _stats(_stack[-1][0] if _stack else OUTSIDE).helpers[name] += perf_counter() - start
+    return timed
+
+
+def _create(call):
+    """Return MetaSplice.__call__ counted per created class."""
+    profiled = dict()
+
+    def profiled_call(cls, *args, **kwargs):
+        func = profiled.get(cls)
+        if func is None:
+            func = profiled[cls] = _profiled((cls.__name__, '__call__'), call)
+        return func(cls, *args, **kwargs)
+    return profiled_call
+
+
+def _swap(owner, name, value):
+    _saved.append((owner, name, vars(owner)[name]))
+    setattr(owner, name, value)
+
+
+def enable():
+    """Start profiling (no-op if the profiler is already enabled)."""
+    global _saved
+    if _saved is not None:
+        return
+    _saved = []
+    # The wrappers and MetaSplice.__call__ look the helpers
+    # up in the splice module's globals on every call.
+    _swap(splice, 'contains_untrusted_arguments', _timed(HELPERS[0], splice.contains_untrusted_arguments))
+    _swap(splice, 'union_argument_taints', _timed(HELPERS[1], splice.union_argument_taints))
+    _swap(splice, 'copy', types.SimpleNamespace(copy=_timed(HELPERS[2], copy.copy), deepcopy=copy.deepcopy))
+    _swap(MetaSplice, '__call__', _create(MetaSplice.__dict__['__call__']))
+    for cls in set(SpliceMixin.registered_cls.values()):
+        for name, value in list(vars(cls).items()):
+            # Wrappers made by to_splice_cls() (functools.wraps sets __wrapped__)
+            if isinstance(value, types.FunctionType) and hasattr(value, '__wrapped__'):
+                _swap(cls, name, _profiled((cls.__name__, name), value))
+
+
+def disable():
+    """Stop profiling and restore the Splice runtime (statistics are kept)."""
+    global _saved
+    if _saved is None:
+        return
+    for owner, name, value in reversed(_saved):
+        setattr(owner, name, value)
+    _saved = None
+    del _stack[:]
+
+
+def reset():
+    """Clear all statistics."""
+    stats.clear()
+
+
+@contextmanager
+def profiling(clear=True):
+    """Profile the Splice runtime within the context (statistics are cleared first if clear is True)."""
+    if clear:
+        reset()
+    enable()
+    try:
+        yield stats
+    finally:
+        disable()
+
+
+def totals():
+    """Return the totals over all methods as a dict (own time does not double count nested calls)."""
+    result = {'calls': 0, 'created': 0, 'own': 0.0}
+    result.update(dict.fromkeys(HELPERS, 0.0))
+    for (_, method), entry in stats.items():
+        if method == '__call__':
+            result['created'] += entry.calls
+        else:
+            result['calls'] += entry.calls
+        result['own'] += entry.own
+        for name, elapsed in entry.helpers.items():
+            result[name] += elapsed
+    return result
+
+
+def report(top=20):
+    """Return a table of the top (by own time) profiled methods as a str."""
+    lines = ['{:<20} {:<24} {:>10} {:>11} {:>11} {:>11} {:>11} {:>11}'.format(
+        'class', 'method', 'calls', 'total (ms)', 'own (ms)', 'check (ms)', 'union (ms)', 'copy (ms)')]
+    rows = sorted(stats.items(), key=lambda item: item[1].own, reverse=True)
+    for (cls, method), entry in rows[:top]:
+        lines.append('{:<20} {:<24} {:>10} {:>11.2f} {:>11.2f} {:>11.2f} {:>11.2f} {:>11.2f}'.format(
+            cls, method, entry.calls, entry.total * 1000, entry.own * 1000,
+            *(entry.helpers[name] * 1000 for name in HELPERS)))
+    return '\n'.join(lines)
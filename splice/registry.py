@@ -0,0 +1,167 @@
+"""Per-taint index of live Splice objects, so deletion never has to walk the whole heap."""
+import ctypes
+import weakref
+
+
+def taint_bits(taints):
+    """Yield every single-bit taint (e.g., 1 << pos) set in taints."""
+    while taints:
+        bit = taints & -taints
+        yield bit
+        taints ^= bit
+
+
+class TaintRegistry(object):
+    """
+    A multimap from a taint bit to the live objects that carry it. The
+    registry never keeps an object alive: SpliceMixin objects are tracked
+    by id only and remove themselves in SpliceMixin.__del__ (many of them,
+    e.g., SpliceInt and SpliceBytes, cannot be weakly referenced at all),
+    while SpliceAttrMixin system objects are tracked with a weakref whose
+    callback removes the entry.
+
+    Entries are keyed by id(obj). Because an entry is always removed before
+    its object is deallocated, an id in the registry always refers to a live
+    object and can safely be resolved back to that object.
+
+    The registry is also generational: time is divided into epochs (a new
+    epoch starts whenever a deletion takes its snapshot of the objects to
+    delete, see advance_epoch()), and the ids of the objects that were
+    created with a taint or retainted in the current epoch are kept apart.
+    Objects a user's connection tainted while a deletion ran can therefore
+    be found without visiting all of the user's objects again.
+    """
+
+    def __init__(self):
+        self._entries = dict()      # id(obj) -> [taints, weakref or None]
+        self._by_bit = dict()       # single-bit taint -> set of id(obj)
+        self.epoch = 0
+        self._young = set()         # ids of objects (re)tainted in the current epoch
+
+    def __len__(self):
+        return len(self._entries)
+
+    def retaint(self, obj, old, new, finalized=False):
+        """
+        Move obj from the buckets of its old taints to the buckets of its new
+        taints. If finalized is True, obj's class is responsible for calling
+        discard() when obj is finalized; otherwise obj must support weakref.
+        """
+        old = old or 0
+        new = new or 0
+        if old == new:
+            return
+        oid = id(obj)
+        entry = self._entries.get(oid)
+        if not new:
+            if entry is not None:
+                self.discard(oid)
+            return
+        self._young.add(oid)
+        if entry is None:
+            if finalized:
+                ref = None
+            else:
+                ref = weakref.ref(obj, lambda _, oid=oid: self.discard(oid))
+            entry = [0, ref]
+            self._entries[oid] = entry
+        for bit in taint_bits(entry[0] & ~new):
+            bucket = self._by_bit.get(bit)
+            if bucket is not None:
+                bucket.discard(oid)
+                if not bucket:
+                    del self._by_bit[bit]
+        for bit in taint_bits(new & ~entry[0]):
+            bucket = self._by_bit.get(bit)
+            if bucket is None:
+                self._by_bit[bit] = {oid}
+            else:
+                bucket.add(oid)
+        entry[0] = new
+
+    def discard(self, oid):
+        """Remove the object with id oid from the registry (no-op if it is not registered)."""
+        entry = self._entries.pop(oid, None)
+        if entry is None:
+            return
+        self._young.discard(oid)
+        for bit in taint_bits(entry[0]):
+            bucket = self._by_bit.get(bit)
+            if bucket is not None:
+                bucket.discard(oid)
+                if not bucket:
+                    del self._by_bit[bit]
+
+    def lookup(self, oid):
+        """Return the live object registered under id oid, or None."""
+        entry = self._entries.get(oid)
+        if entry is None:
+            return None
+        if entry[1] is not None:
+            return entry[1]()
+        return ctypes.cast(oid, ctypes.py_object).value
+
+    def ids(self, taints):
+        """Return the set of ids of objects that carry at least one bit in taints."""
+        oids = set()
+        for bit in taint_bits(taints):
+            bucket = self._by_bit.get(bit)
+            if bucket is not None:
+                oids.update(bucket)
+        return oids
+
+    def objects(self, taints):
+        """
+        Return a list of live objects that carry at least one bit in taints.
+        The list is a snapshot, so callers can retaint the objects while
+        iterating through it.
+        """
+        objs = []
+        for oid in self.ids(taints):
+            obj = self.lookup(oid)
+            if obj is not None:
+                objs.append(obj)
+        return objs
+
+    def advance_epoch(self):
+        """Start a new epoch, in which no object is young yet, and return its number."""
+        self.epoch += 1
+        self._young = set()
+        return self.epoch
+
+    def young_objects(self, taints):
+        """
+        Return a list of live objects that carry at least one bit in taints
+        and were created with a taint or retainted in the current epoch.
+        """
+        young = self._young
+        # Visit either the young ids or the ids that carry taints, whichever are fewer.
+        if sum(len(self._by_bit.get(bit, ())) for bit in taint_bits(taints)) < len(young):
+            oids = self.ids(taints)
+        else:
+            oids = young
+        objs = []
+        for oid in oids:
+            if oid not in young:
+                continue
+            entry = self._entries[oid]
+            if not entry[0] & taints:
+                continue
+            obj = self.lookup(oid)
+            if obj is not None:
+                objs.append(obj)
+        return objs
+
+    def has_objects(self, taints):
+        """Return True if any live object carries a bit in taints."""
+        for bit in taint_bits(taints):
+            if bit in self._by_bit:
+                return True
+        return False
+
+
+taint_registry = TaintRegistry()
+
+
+if __name__ == "__main__":
+    pass
@@ -1,9 +1,13 @@
 import functools
 import warnings
 import copy
+from collections import Counter
+from decimal import Decimal
+from datetime import date, time, timedelta
 
 from .utils import is_class_method, is_static_method
-from .identity import TaintSource, empty_taint
+from .identity import TaintSource, empty_taint, get_current_user_taint
+from .registry import taint_registry
 
 
 # Special methods that should not be decorated.
@@ -45,27 +49,32 @@ do_not_decorate = {'__init__',
                    '__copy__',
                    }
 
+# Built-in base types whose instances cannot be mutated in place. Methods
+# of Splice classes derived from them never need to check if "self" is
+# modified by the call (note that datetime is a subclass of date).
+immutable_types = (int, float, str, bytes, Decimal, date, time, timedelta)
 
-def check_tag(obj, check_synthesis=False, depth=2):
-    """
-    By default, the function returns the trusted tag of an obj. If check_synthesis
-    is set to be True, then it will also return the synthesized tag of the obj.
-    Note that, for example, if an obj contains an untrusted data attribute, the
-    obj itself will be considered to be untrusted (same for the synthesized tag).
-    We recursively go through obj's data attributes but at most depth levels. By
-    default, we only look into the obj's data attributes, not its attribute's data
-    attribute (i.e., depth=1) unless the attribute is a sequence or a map (in such
-    cases we do not decrement the depth).
-    """
-    if isinstance(obj, SpliceMixin):
-        if check_synthesis:
-            return obj.trusted, obj.synthesized
-        return obj.trusted
-    elif depth == 0:
-        if check_synthesis:
-            return True, False
-        else:
-            return True
+
+# Number of times an obj of each type could not be inspected for tags or
+# taints (perhaps because it is not a built-in typed obj), by type.
+uninspectable = Counter()
+
+# Per-type dispatch tables from the type of an obj to the function that
+# inspects its tags (check_tag) or its taints (is_tainted_by). They are
+# filled lazily by _tag_inspector() and _taint_inspector() the first time
+# an obj of a type is inspected, so that every later obj of the same type
+# costs one dict lookup (opaque types included).
+_tag_inspectors = dict()
+_taint_inspectors = dict()
+
+# Kinds of types for the dispatch tables
+_SPLICE, _MAPPING, _SEQUENCE, _OPAQUE = range(4)
+
+
+def _inspection_kind(cls):
+    """Return the kind of obj an instance of cls is for tag and taint inspection."""
+    if issubclass(cls, SpliceMixin):
+        return _SPLICE
     # For dict-like mapping objs
     ################################################################################################################
     # NOTE: According to Python data model, it is recommended that any customized mappings provide the items()
@@ -74,88 +83,110 @@ def check_tag(obj, check_synthesis=False, depth=2):
     #       Python's recommended data model. Reference here:
     #       https://docs.python.org/3.8/reference/datamodel.html?emulating-container-types#emulating-container-types
     ################################################################################################################
-    elif hasattr(obj, 'items') and hasattr(obj, '__iter__'):
-        t = True
-        for k, v in obj.items():
-            if check_synthesis:
-                trusted, synthesized = check_tag(k, check_synthesis, depth-1)
-                # If k is synthesized, it must not be trusted. No need to continue.
-                if synthesized:
-                    return trusted, synthesized
-                # If k is not synthesized, it can still be untrusted
-                else:
-                    t = t and trusted
-                # The same logic used in k is used in v
-                trusted, synthesized = check_tag(v, check_synthesis, depth-1)
-                if synthesized:
-                    return trusted, synthesized
-                else:
-                    t = t and trusted
-            else:
-                trusted = check_tag(k, check_synthesis, depth-1)
-                if not trusted:
-                    return trusted
-                trusted = check_tag(v, check_synthesis, depth-1)
-                if not trusted:
-                    return trusted
-        if check_synthesis:
-            return t, False
-        else:
-            return True
-    # For list-like sequence objs. We use isinstance to test 'list',
+    elif hasattr(cls, 'items') and hasattr(cls, '__iter__'):
+        return _MAPPING
+    # For list-like sequence objs. We use issubclass to test 'list',
     # 'tuple' and 'set' for now. We do not want to use something like
-    # hasattr(obj, '__iter__') because data types such as 'str' and
+    # hasattr(cls, '__iter__') because data types such as 'str' and
     # 'bytes', which are clearly not tainted, will have '__iter__'!
-    elif isinstance(obj, list) or isinstance(obj, tuple) or isinstance(obj, set):
-        t = True
-        for v in obj:
-            if check_synthesis:
-                trusted, synthesized = check_tag(v, check_synthesis, depth-1)
-                if synthesized:
-                    return trusted, synthesized
-                else:
-                    t = t and trusted
-            else:
-                trusted = check_tag(v, check_synthesis, depth-1)
-                if not trusted:
-                    return trusted
-        if check_synthesis:
-            return t, False
-        else:
-            return True
+    elif issubclass(cls, (list, tuple, set)):
+        return _SEQUENCE
     ####################################################
     # TODO: Add other specific data types if needed here
     ####################################################
-    ############################################################################
-    # NOTE: We try out best to iterative through a generic obj's data attributes
-    #       if the obj has __dict__ attribute for us to traverse through and if
-    #       it is not yet the deepest we are told to go.
-    ############################################################################
-    # elif hasattr(obj, '__dict__'):
-    #     t = True
-    #     for _, attr in vars(obj).items():
-    #         if check_synthesis:
-    #             trusted, synthesized = check_tag(attr, check_synthesis, depth-1)
-    #             if synthesized:
-    #                 return trusted, synthesized
-    #             else:
-    #                 t = t and trusted
-    #         else:
-    #             trusted = check_tag(attr, check_synthesis, depth-1)
-    #             if not trusted:
-    #                 return trusted
-    #     if check_synthesis:
-    #         return t, False
-    #     else:
-    #         return True
+    return _OPAQUE
+
+
+def _check_splice_tag(obj, check_synthesis, depth):
+    if check_synthesis:
+        return obj.trusted, obj.synthesized
+    return obj.trusted
+
+
+def _check_mapping_tag(obj, check_synthesis, depth):
+    if depth == 0:
+        return (True, False) if check_synthesis else True
+    t = True
+    for k, v in obj.items():
+        if check_synthesis:
+            trusted, synthesized = check_tag(k, check_synthesis, depth-1)
+            # If k is synthesized, it must not be trusted. No need to continue.
+            if synthesized:
+                return trusted, synthesized
+            # If k is not synthesized, it can still be untrusted
+            else:
+                t = t and trusted
+            # The same logic used in k is used in v
+            trusted, synthesized = check_tag(v, check_synthesis, depth-1)
+            if synthesized:
+                return trusted, synthesized
+            else:
+                t = t and trusted
+        else:
+            trusted = check_tag(k, check_synthesis, depth-1)
+            if not trusted:
+                return trusted
+            trusted = check_tag(v, check_synthesis, depth-1)
+            if not trusted:
+                return trusted
+    if check_synthesis:
+        return t, False
     else:
-        if __debug__:
-            warnings.warn("{obj} (of type {type}) cannot be inspected for tags"
-                          " (perhaps because it is not a built-in typed obj".format(obj=obj, type=type(obj)))
+        return True
+
+
+def _check_sequence_tag(obj, check_synthesis, depth):
+    if depth == 0:
+        return (True, False) if check_synthesis else True
+    t = True
+    for v in obj:
         if check_synthesis:
-            return True, False
+            trusted, synthesized = check_tag(v, check_synthesis, depth-1)
+            if synthesized:
+                return trusted, synthesized
+            else:
+                t = t and trusted
         else:
-            return True
+            trusted = check_tag(v, check_synthesis, depth-1)
+            if not trusted:
+                return trusted
+    if check_synthesis:
+        return t, False
+    else:
+        return True
+
+
+def _check_opaque_tag(obj, check_synthesis, depth):
+    if depth:
+        uninspectable[type(obj)] += 1
+    if check_synthesis:
+        return True, False
+    else:
+        return True
+
+
+def _tag_inspector(cls):
+    """Return (and remember) the function that inspects the tags of an instance of cls."""
+    inspector = (_check_splice_tag, _check_mapping_tag, _check_sequence_tag, _check_opaque_tag)[_inspection_kind(cls)]
+    _tag_inspectors[cls] = inspector
+    return inspector
+
+
+def check_tag(obj, check_synthesis=False, depth=2):
+    """
+    By default, the function returns the trusted tag of an obj. If check_synthesis
+    is set to be True, then it will also return the synthesized tag of the obj.
+    Note that, for example, if an obj contains an untrusted data attribute, the
+    obj itself will be considered to be untrusted (same for the synthesized tag).
+    We recursively go through obj's data attributes but at most depth levels. By
+    default, we only look into the obj's data attributes, not its attribute's data
+    attribute (i.e., depth=1) unless the attribute is a sequence or a map (in such
+    cases we do not decrement the depth). An obj that cannot be inspected is
+    considered to be trusted and not synthesized, and is counted in uninspectable.
+    """
+    cls = type(obj)
+    inspector = _tag_inspectors.get(cls) or _tag_inspector(cls)
+    return inspector(obj, check_synthesis, depth)
 
 
 def is_untrusted(value):
@@ -226,13 +257,17 @@ def contains_untrusted_arguments(*args, **kwargs):
     """Check if arguments passed into a function/method contains untrusted and synthesized value."""
     untrusted = False
     for arg in args:
-        trusted, synthesized = check_tag(arg, check_synthesis=True)
+        cls = type(arg)
+        inspector = _tag_inspectors.get(cls) or _tag_inspector(cls)
+        trusted, synthesized = inspector(arg, True, 2)
         if synthesized:
             return True, True
         elif not trusted:
             untrusted = True
-    for _, v in kwargs.items():
-        trusted, synthesized = check_tag(v, check_synthesis=True)
+    for v in kwargs.values():
+        cls = type(v)
+        inspector = _tag_inspectors.get(cls) or _tag_inspector(cls)
+        trusted, synthesized = inspector(v, True, 2)
         if synthesized:
             return True, True
         elif not trusted:
@@ -240,40 +275,47 @@ def contains_untrusted_arguments(*args, **kwargs):
     return untrusted, False
 
 
-def is_tainted_by(obj, depth=2):
-    """Return the taint of an obj. Note that taints *cannot* be None. """
+def _splice_taints(obj, depth):
+    return obj.taints
+
+
+def _mapping_taints(obj, depth):
     taints = empty_taint()
-    if isinstance(obj, SpliceMixin):
-        return obj.taints
-    elif depth == 0:
-        return taints
-    # For dict-like mapping objs (see notes in check_tag)
-    elif hasattr(obj, 'items') and hasattr(obj, '__iter__'):
+    if depth:
         for k, v in obj.items():
             taints |= is_tainted_by(k, depth-1)
             taints |= is_tainted_by(v, depth-1)
-    # For list-like sequence objs
-    elif isinstance(obj, list) or isinstance(obj, tuple) or isinstance(obj, set):
+    return taints
+
+
+def _sequence_taints(obj, depth):
+    taints = empty_taint()
+    if depth:
         for v in obj:
             taints |= is_tainted_by(v, depth-1)
-    ####################################################
-    # TODO: Add other specific data types if needed here
-    ####################################################
-    ############################################################################
-    # NOTE: We try out best to iterative through a generic obj's data attributes
-    #       if the obj has __dict__ attribute for us to traverse through and if
-    #       it is not yet the deepest we are told to go.
-    ############################################################################
-    # elif hasattr(obj, '__dict__'):
-    #     for _, attr in vars(obj).items():
-    #         taints |= is_tainted_by(attr, depth-1)
-    else:
-        if __debug__:
-            warnings.warn("{obj} (of type {type}) cannot be "
-                          "inspected for taints".format(obj=obj, type=type(obj)))
     return taints
 
 
+def _opaque_taints(obj, depth):
+    if depth:
+        uninspectable[type(obj)] += 1
+    return empty_taint()
+
+
+def _taint_inspector(cls):
+    """Return (and remember) the function that inspects the taints of an instance of cls."""
+    inspector = (_splice_taints, _mapping_taints, _sequence_taints, _opaque_taints)[_inspection_kind(cls)]
+    _taint_inspectors[cls] = inspector
+    return inspector
+
+
+def is_tainted_by(obj, depth=2):
+    """Return the taint of an obj. Note that taints *cannot* be None. """
+    cls = type(obj)
+    inspector = _taint_inspectors.get(cls) or _taint_inspector(cls)
+    return inspector(obj, depth)
+
+
 def union_argument_taints(*args, **kwargs):
     """
     Return a union of all taints associated with args and kwargs. Note that the return object
@@ -321,7 +363,10 @@ def untrusted(func):
         if res is NotImplemented or res is None:
             return res
         res = to_untrusted(res)
-        return add_taints(res, TaintSource.current_user_taint)
+        taints = get_current_user_taint()
+        if taints is None:
+            taints = empty_taint()
+        return add_taints(res, taints)
 
     return wrapper
 
@@ -376,7 +421,9 @@ class MetaSplice(type):
     An object *cannot* be both trusted and synthesized.
 
     The new object's taint is the union of all taints of its arguments, and the taints
-    keyword parameter which is optional (default is no taint).
+    keyword parameter which is optional (default is no taint). Within a user's taint
+    scope (see identity.taint_scope()), the scope's taint replaces the union of the
+    argument taints, so the arguments need not be inspected.
     """
 
     def __call__(cls, *args, **kwargs):
@@ -470,10 +517,15 @@ class MetaSplice(type):
         # Final check to make sure flag values make sense
         if obj._trusted and obj._synthesized:
             raise AttributeError("Cannot initialize a trusted and synthesized object.")
-        # Object taint update
-        obj._taints = union_argument_taints(*args, **kwargs)
+        # Object taint update (through the setter so that
+        # the object is indexed by its taints for deletion)
+        scoped = TaintSource.current_user_taint.get()
+        if scoped is None:
+            scoped = union_argument_taints(*args, **kwargs)
         if taints is not None:
-            obj._taints |= taints
+            obj.taints = scoped | taints
+        else:
+            obj.taints = scoped
         obj._constraints = constraints
         return obj
 
@@ -519,6 +571,37 @@ class SpliceMixin(metaclass=MetaSplice):
         SpliceMixin.to_splice_cls(cls)
         SpliceMixin.register(cls)
 
+    def __del__(self):
+        """
+        Remove a tainted object from the taint registry before it is deallocated.
+        Note that most Splice objects (e.g., SpliceInt) cannot be weakly referenced,
+        so the registry relies on this finalizer instead of weakref callbacks.
+        """
+        if self.__dict__.get('_taints'):
+            taint_registry.discard(id(self))
+
+    def __setstate__(self, state):
+        """
+        Restore the state of an object created by copy(), deepcopy() or unpickling.
+        Without this method, they update __dict__ directly, so the taints would
+        bypass the taints setter and the object would be missing from the taint
+        registry (and from deletion).
+        """
+        if isinstance(state, tuple):
+            state, slots = state
+        else:
+            slots = None
+        if state:
+            # state may be the original object's own __dict__ (e.g., copy()).
+            taints = state.get('_taints')
+            self.__dict__.update(state)
+            if taints:
+                del self.__dict__['_taints']
+                self.taints = taints
+        if slots:
+            for key, value in slots.items():
+                setattr(self, key, value)
+
     # def __str__(self):
     #     if not self.trusted:
     #         raise TypeError("cannot use str() or __str__ to coerce an untrusted value to str. "
@@ -651,11 +734,23 @@ class SpliceMixin(metaclass=MetaSplice):
         will be decorated (and therefore the calling special method).
         """
 
+        immutable = issubclass(cls, immutable_types)
+
         def to_splice_method(func):
             """
             A function decorator that makes the original function (that
             may not be trust-aware) return (un)trusted value(s) if possible.
             """
+            # Check if "self" (i.e., the first argument) can be modified.
+            # Note that this check applies only to methods that are
+            # not a class method or a static method, because otherwise
+            # the first argument is not "self"! A method's kind never
+            # changes, so we classify it once here at decoration time
+            # (before the method is replaced by the wrapper in cls).
+            # "self" of an immutable type can never be modified.
+            check_self = not immutable \
+                and not is_static_method(cls, func.__name__) \
+                and not is_class_method(cls, func.__name__)
 
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
@@ -666,13 +761,16 @@ class SpliceMixin(metaclass=MetaSplice):
                 # TODO: does it *always* make sense to consider the return value/self
                 #  untrusted/synthesized/tainted as long as any one of the input is?
                 untrusted, synthesized = contains_untrusted_arguments(*args, **kwargs)
-                taints = union_argument_taints(*args, **kwargs)
-                # Check if "self" (i.e., the first argument) is modified
-                # Note that this check applies only to methods that are
-                # not a class method or a static method, because otherwise
-                # the first argument is not "self"!
-                is_static = is_static_method(cls, func.__name__)
-                is_class = is_class_method(cls, func.__name__)
+                # Within a user's taint scope, the result is tainted by that
+                # user alone, so we do not have to inspect the arguments.
+                taints = TaintSource.current_user_taint.get()
+                if taints is None:
+                    taints = union_argument_taints(*args, **kwargs)
+                if not check_self or not args:
+                    res = func(*args, **kwargs)
+                    if res is None or res is NotImplemented or isinstance(res, SpliceMixin):
+                        return res
+                    return SpliceMixin.to_splice(res, not untrusted, synthesized, taints, [])
                 # We must use deep copy so that it actually holds a copy
                 # of the original "self", not just a reference. This is
                 # important for mutable objects.
@@ -685,9 +783,8 @@ class SpliceMixin(metaclass=MetaSplice):
                 res = func(*args, **kwargs)
                 # If in-place updates occurred in func, then the object
                 # referenced by args[0] will be different from the
-                # original copy. Note that for immutable objects, this
-                # should never be the case!
-                if not is_static and not is_class and self != args[0]:
+                # original copy.
+                if self != args[0]:
                     # "self" should be splice-aware
                     # FIXME: This may not be true for user-defined classes
                     if not isinstance(args[0], SpliceMixin):
@@ -805,8 +902,12 @@ class SpliceMixin(metaclass=MetaSplice):
     @staticmethod
     def register(cls):
         """Register the Splice class with its inherited counterpart so conversion can be automated."""
-
-        orig = cls.__mro__[2]  # IMPORTANT: the inherited (including built-in) class MUST be the third class in MRO!
+        # A Splice class that wraps the class it stands for instead of inheriting
+        # it (e.g., SpliceMemoryView, as memoryview cannot be subclassed) names
+        # that class in wrapped_cls.
+        orig = cls.__dict__.get('wrapped_cls')
+        if orig is None:
+            orig = cls.__mro__[2]  # IMPORTANT: the inherited (including built-in) class MUST be the third class in MRO!
         SpliceMixin.registered_cls[orig.__name__] = cls
 
     @property
@@ -831,6 +932,7 @@ class SpliceMixin(metaclass=MetaSplice):
 
     @taints.setter
     def taints(self, taints):
+        taint_registry.retaint(self, self.__dict__.get('_taints'), taints, finalized=True)
         self._taints = taints
 
     @property
@@ -919,4 +1021,5 @@ class SpliceAttrMixin(object):
 
     @taints.setter
     def taints(self, taints):
+        taint_registry.retaint(self, getattr(self, '_taints', None), taints)
         self._taints = taints
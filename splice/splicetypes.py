@@ -8,11 +8,13 @@ import asyncio
 
 from decimal import Decimal
 from datetime import datetime, date, time, timedelta
+from bisect import bisect_left, bisect_right
 from collections import UserString
 from contextlib import contextmanager
 
-from .splice import SpliceMixin, SpliceAttrMixin
+from .splice import SpliceMixin, SpliceAttrMixin, contains_untrusted_arguments, union_argument_taints
 from .identity import empty_taint, taint_id_from_addr
+from .registry import taint_registry
 
 
 class SpliceInt(SpliceMixin, int):
@@ -135,6 +137,119 @@ class SpliceStr(SpliceMixin, str):
         return super().__str__()
 
 
+# Bulk operations shared by SpliceBytes and SpliceBytearray. Iterating a
+# Splice byte buffer yields one SpliceInt per byte, so code that scans
+# tunnel payloads byte by byte allocates one Splice object per byte.
+# These operations work on the whole buffer at C speed instead, and keep
+# the taint on their result (or, for raw iteration, on the buffer only).
+
+def _find_all(buf, base, sub, start, end):
+    """
+    Return the offsets of all non-overlapping occurrences of sub in
+    buf[start:end] as splice-aware ints. The offsets are tainted (and
+    flagged) by both buf and sub, as the result of buf.find() would be.
+    """
+    find = base.find
+    step = max(len(sub), 1)
+    if end is None:
+        end = len(buf)
+    offsets = []
+    i = find(buf, sub, start, end)
+    while i >= 0:
+        offsets.append(i)
+        i = find(buf, sub, i + step, end)
+    untrusted, synthesized = contains_untrusted_arguments(buf, sub)
+    return SpliceMixin.to_splice(offsets, not untrusted, synthesized, union_argument_taints(buf, sub), [])
+
+
+# The numpy array class for to_numpy(), created the first
+# time it is needed as numpy is an optional dependency.
+_ndarray_cls = None
+
+
+def _splice_ndarray():
+    global _ndarray_cls
+    if _ndarray_cls is None:
+        import numpy
+
+        class SpliceNDArray(numpy.ndarray):
+            """
+            A numpy array whose taints, trusted and synthesized flags are
+            kept on the array, not on its elements. Arrays derived from it
+            (e.g., slices, views and the results of ufuncs) inherit them.
+            Like system objects, arrays are tracked by the taint registry
+            with a weakref, so that deletion can find (and flag) them.
+            """
+            def __array_finalize__(self, obj):
+                self.taints = getattr(obj, 'taints', empty_taint())
+                self.trusted = getattr(obj, 'trusted', True)
+                self.synthesized = getattr(obj, 'synthesized', False)
+                self.constraints = []
+
+            @property
+            def taints(self):
+                return self._taints
+
+            @taints.setter
+            def taints(self, taints):
+                taint_registry.retaint(self, getattr(self, '_taints', None), taints)
+                self._taints = taints
+
+            def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+                """
+                Compute the ufunc on plain arrays and give its array results the
+                union of the taints of all Splice operands. A result is trusted
+                only if every operand is, and synthesized if any operand is.
+                Scalar results (e.g., of a full reduction) carry no taint.
+                """
+                out = kwargs.get('out', ())
+                taints = empty_taint()
+                trusted = True
+                synthesized = False
+                for operand in inputs + out:
+                    if isinstance(operand, (SpliceNDArray, SpliceMixin)):
+                        taints |= operand.taints
+                        trusted = trusted and operand.trusted
+                        synthesized = synthesized or operand.synthesized
+                args = tuple(x.view(numpy.ndarray) if isinstance(x, SpliceNDArray) else x for x in inputs)
+                if out:
+                    kwargs['out'] = tuple(x.view(numpy.ndarray) if isinstance(x, SpliceNDArray) else x
+                                          for x in out)
+                results = getattr(ufunc, method)(*args, **kwargs)
+                if method == 'at':
+                    # Computed in place, in the first operand.
+                    results, out = (None, ), (inputs[0], )
+                elif ufunc.nout == 1 or method != '__call__':
+                    results = (results, )
+                wrapped = []
+                for i, result in enumerate(results):
+                    if i < len(out) and out[i] is not None:
+                        result = out[i]
+                    elif isinstance(result, numpy.ndarray):
+                        result = result.view(SpliceNDArray)
+                    if isinstance(result, SpliceNDArray):
+                        result.taints = taints
+                        result.trusted = trusted
+                        result.synthesized = synthesized
+                    wrapped.append(result)
+                if method == 'at':
+                    return None
+                return wrapped[0] if len(wrapped) == 1 else tuple(wrapped)
+
+        _ndarray_cls = SpliceNDArray
+    return _ndarray_cls
+
+
+def _to_numpy(buf):
+    """Return a uint8 numpy array that shares memory with buf and carries its taint."""
+    import numpy
+    array = numpy.frombuffer(buf, dtype=numpy.uint8).view(_splice_ndarray())
+    array.taints = buf.taints
+    array.trusted = buf.trusted
+    array.synthesized = buf.synthesized
+    return array
+
+
 class SpliceBytes(SpliceMixin, bytes):
     """Subclass Python builtin bytes class and SpliceMixin."""
     @classmethod
@@ -146,6 +261,30 @@ class SpliceBytes(SpliceMixin, bytes):
         for x in super().__iter__():
             yield SpliceMixin.to_splice(x, self.trusted, self.synthesized, self.taints, self.constraints)
 
+    def find_all(self, sub, start=0, end=None):
+        """
+        Return the offsets of all non-overlapping occurrences of sub in
+        self[start:end], searched in a single pass. Only the offsets are
+        splice-aware objects, not the bytes that are searched through.
+        """
+        return _find_all(self, bytes, sub, start, end)
+
+    def iter_raw(self):
+        """
+        Iterate over the bytes as plain ints. Unlike __iter__, no splice-aware
+        value is created per byte: the taint stays on self and it is up to
+        the caller to carry it over to anything computed from the bytes.
+        """
+        return bytes.__iter__(self)
+
+    def to_numpy(self):
+        """
+        Return the bytes as a numpy uint8 array without copying. The array
+        carries the taints, trusted and synthesized flags of self as a whole.
+        numpy must be installed.
+        """
+        return _to_numpy(self)
+
     def unsplicify(self):
         return bytes(self)
 
@@ -161,10 +300,125 @@ class SpliceBytearray(SpliceMixin, bytearray):
         for x in super().__iter__():
             yield SpliceMixin.to_splice(x, self.trusted, self.synthesized, self.taints, self.constraints)
 
+    def find_all(self, sub, start=0, end=None):
+        """
+        Return the offsets of all non-overlapping occurrences of sub in
+        self[start:end], searched in a single pass. Only the offsets are
+        splice-aware objects, not the bytes that are searched through.
+        """
+        return _find_all(self, bytearray, sub, start, end)
+
+    def iter_raw(self):
+        """
+        Iterate over the bytes as plain ints. Unlike __iter__, no splice-aware
+        value is created per byte: the taint stays on self and it is up to
+        the caller to carry it over to anything computed from the bytes.
+        """
+        return bytearray.__iter__(self)
+
+    def to_numpy(self):
+        """
+        Return the bytes as a numpy uint8 array without copying. The array
+        carries the taints, trusted and synthesized flags of self as a whole.
+        numpy must be installed.
+        """
+        return _to_numpy(self)
+
     def unsplicify(self):
         return bytearray(self)
 
 
+class SpliceMemoryView(SpliceMixin):
+    """
+    A taint-preserving memoryview. memoryview cannot be subclassed, so this
+    class wraps a memoryview of a buffer-exporting object (e.g., SpliceBytes)
+    and keeps the taints, trusted and synthesized flags of that object.
+    Slicing does not copy the buffer and the slices keep the flags. Note
+    that it does not export a buffer itself: use unsplicify() to hand the
+    plain memoryview to functions that need one (e.g., struct.unpack()).
+    """
+    wrapped_cls = memoryview
+
+    def __init__(self, obj):
+        if isinstance(obj, SpliceMemoryView):
+            obj = obj._view
+        self._view = memoryview(obj)
+
+    @classmethod
+    def splicify(cls, value, trusted, synthesized, taints, constraints):
+        return SpliceMemoryView(value, trusted=trusted, synthesized=synthesized, taints=taints,
+                                constraints=constraints)
+
+    def _derive(self, view):
+        """
+        Return a SpliceMemoryView of view with the flags and taints of self.
+        Going through MetaSplice would inspect self again for every slice.
+        """
+        derived = object.__new__(type(self))
+        derived._view = view
+        derived._trusted = self._trusted
+        derived._synthesized = self._synthesized
+        derived._constraints = []
+        derived.taints = self._taints
+        return derived
+
+    def __len__(self):
+        return len(self._view)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._derive(self._view[index])
+        return SpliceMixin.to_splice(self._view[index], self.trusted, self.synthesized, self.taints, [])
+
+    def __iter__(self):
+        """Define __iter__ so the iterator returns a splice-aware value."""
+        for x in self._view:
+            yield SpliceMixin.to_splice(x, self.trusted, self.synthesized, self.taints, self.constraints)
+
+    def iter_raw(self):
+        """Iterate over the items as plain values (see SpliceBytes.iter_raw())."""
+        return iter(self._view)
+
+    def __eq__(self, other):
+        if isinstance(other, SpliceMemoryView):
+            other = other._view
+        return self._view == other
+
+    def __hash__(self):
+        return hash(self._view)
+
+    def __repr__(self):
+        return '<splice memory at {:#x}>'.format(id(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @property
+    def nbytes(self):
+        return self._view.nbytes
+
+    @property
+    def readonly(self):
+        return self._view.readonly
+
+    def release(self):
+        self._view.release()
+
+    def tobytes(self):
+        return SpliceMixin.to_splice(self._view.tobytes(), self.trusted, self.synthesized, self.taints, [])
+
+    __bytes__ = tobytes
+
+    def hex(self):
+        return SpliceMixin.to_splice(self._view.hex(), self.trusted, self.synthesized, self.taints, [])
+
+    def unsplicify(self):
+        return self._view
+
+
 class SpliceDecimal(SpliceMixin, Decimal):
     """Subclass Python decimal module's Decimal class and SpliceMixin."""
     @classmethod
@@ -281,101 +535,102 @@ class SpliceTimedelta(SpliceMixin, timedelta):
 
 
 class SpliceUserString(UserString):
+    """
+    A str whose characters carry their own taints, synthesized and trusted
+    flags. The flags are stored run-length encoded: _labels holds the
+    (taints, synthesized, trusted) label of each run of characters that
+    share the same flags and _ends the (exclusive) end offset of each run
+    in data, so a string from a single source costs one run regardless of
+    its length. Runs are never modified in place, so strings can share
+    them. The taints, synthesized and trusted attributes expand the runs
+    to one entry per character for compatibility.
+    """
     # TODO: To complete instrumentation for all
     #  methods defined in UserString.
     def __init__(self, seq):
         if isinstance(seq, SpliceUserString):
-            self.taints = seq.taints
-            self.synthesized = seq.synthesized
-            self.trusted = seq.trusted
             self.data = seq.data[:]
+            self._set_runs(seq._ends, seq._labels, seq._sums)
             self._constraints = seq.constraints
         else:
             self.data = str(seq)
             if isinstance(seq, SpliceMixin):
-                self.taints = [seq.taints] * len(self.data)
-                self.synthesized = [seq.synthesized] * len(self.data)
-                self.trusted = [seq.trusted] * len(self.data)
+                label = (seq.taints, seq.synthesized, seq.trusted)
                 self._constraints = seq.constraints
                 self.data = self.data.unsplicify()
             else:
-                self.taints = [empty_taint()] * len(self.data)
-                self.synthesized = [False] * len(self.data)
-                self.trusted = [True] * len(self.data)
+                label = (empty_taint(), False, True)
                 self._constraints = []
+            self._set_runs(*self._single_run(len(self.data), label))
 
     def __str__(self):
         # REQUIRE: Redefine constraints
-        return SpliceStr(self.data, taints=self._sum_taints(), synthesized=self._sum_synthesized(),
-                         trusted=self._sum_trusted(), constraints=[])
+        taints, synthesized, trusted = self._aggregates()
+        return SpliceStr(self.data, taints=taints, synthesized=synthesized, trusted=trusted, constraints=[])
 
     def __len__(self):
-        return SpliceInt(len(self.data), taints=self._sum_taints(),
-                         synthesized=self._sum_synthesized(), trusted=self._sum_trusted(), constraints=[])
+        taints, synthesized, trusted = self._aggregates()
+        return SpliceInt(len(self.data), taints=taints, synthesized=synthesized, trusted=trusted, constraints=[])
 
     def __getitem__(self, index):
         # REQUIRE: Redefine constraints
         s = self.__class__(self.data[index])
-        s.taints = self.taints[index]
-        s.synthesized = self.synthesized[index]
-        s.trusted = self.trusted[index]
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.data))
+            if step == 1:
+                s._set_runs(*self._slice_runs(start, stop))
+            else:
+                s._set_runs(*self._encode(self._expand()[index]))
+        else:
+            index = index + len(self.data) if index < 0 else index
+            s._set_runs(*self._single_run(1, self._labels[bisect_right(self._ends, index)]))
         s._constraints = []
         return s
 
     def __add__(self, other):
         # REQUIRE: Redefine constraints
-        if isinstance(other, SpliceUserString):
-            s = self.__class__(self.data + other.data)
-            s.taints = self.taints + other.taints
-            s.synthesized = self.synthesized + other.synthesized
-            s.trusted = self.trusted + other.trusted
-            s._constraints = []
-            return s
-        else:
-            other = str(other)
-            if isinstance(other, SpliceMixin):
-                s = self.__class__(self.data + other.unsplicify())
-                s.taints = self.taints + [other.taints] * len(other)
-                s.synthesized = self.synthesized + [other.synthesized] * len(other)
-                s.trusted = self.trusted + [other.trusted] * len(other)
-                s._constraints = []
-                return s
-            else:
-                s = self.__class__(self.data + other)
-                s.taints = self.taints + [empty_taint()] * len(other)
-                s.synthesized = self.synthesized + [False] * len(other)
-                s.trusted = self.trusted + [True] * len(other)
-                s._constraints = []
-                return s
+        if not isinstance(other, SpliceUserString):
+            other = self.__class__(str(other))
+        s = self.__class__(self.data + other.data)
+        s._set_runs(*self._concat_runs(self, other))
+        s._constraints = []
+        return s
 
     def __radd__(self, other):
         # REQUIRE: Redefine constraints
         # TODO: SpliceStr + SpliceUserString will call SpliceStr's __add__,
         #  but SpliceStr's __add__ cannot handle SpliceUserString. To fix
         #  this, however, we need to modify SpliceMixin.
-        if isinstance(other, SpliceUserString):
-            s = self.__class__(other.data + self.data)
-            s.taints = other.taints + self.taints
-            s.synthesized = other.synthesized + self.synthesized
-            s.trusted = other.trusted + self.trusted
-            s._constraints = []
-            return s
-        else:
-            other = str(other)
-            if isinstance(other, SpliceMixin):
-                s = self.__class__(other.unsplicify() + self.data)
-                s.taints = [other.taints] * len(other) + self.taints
-                s.synthesized = [other.synthesized] * len(other) + self.synthesized
-                s.trusted = [other.trusted] * len(other) + self.trusted
-                s._constraints = []
-                return s
-            else:
-                s = self.__class__(other + self.data)
-                s.taints = [empty_taint()] * len(other) + self.taints
-                s.synthesized = [False] * len(other) + self.synthesized
-                s.trusted = [True] * len(other) + self.trusted
-                s._constraints = []
-                return s
+        if not isinstance(other, SpliceUserString):
+            other = self.__class__(str(other))
+        s = self.__class__(other.data + self.data)
+        s._set_runs(*self._concat_runs(other, self))
+        s._constraints = []
+        return s
+
+    @property
+    def taints(self):
+        return [label[0] for label in self._expand()]
+
+    @taints.setter
+    def taints(self, taints):
+        self._set_runs(*self._encode([(t, s, tr) for t, (_, s, tr) in zip(taints, self._expand())]))
+
+    @property
+    def synthesized(self):
+        return [label[1] for label in self._expand()]
+
+    @synthesized.setter
+    def synthesized(self, synthesized):
+        self._set_runs(*self._encode([(t, s, tr) for s, (t, _, tr) in zip(synthesized, self._expand())]))
+
+    @property
+    def trusted(self):
+        return [label[2] for label in self._expand()]
+
+    @trusted.setter
+    def trusted(self, trusted):
+        self._set_runs(*self._encode([(t, s, tr) for tr, (t, s, _) in zip(trusted, self._expand())]))
 
     @property
     def constraints(self):
@@ -405,10 +660,87 @@ class SpliceUserString(UserString):
                     raise TypeError("Each constraint must be a callable that returns a map"
                                     "of concrete constraints for Z3 to synthesize.")
 
+    def _set_runs(self, ends, labels, sums=None):
+        self._ends = ends
+        self._labels = labels
+        # Cached (taints, synthesized, trusted) aggregates
+        # of all characters (see _aggregates()), if known.
+        self._sums = sums
+
+    def _aggregates(self):
+        """Return the union of the taints and the synthesized and trusted flags of the entire str."""
+        if self._sums is None:
+            self._sums = (self._sum_taints(), self._sum_synthesized(), self._sum_trusted())
+        return self._sums
+
+    @staticmethod
+    def _single_run(length, label):
+        """Return the runs (ends, labels, aggregates) of length characters that all have label."""
+        if length == 0:
+            return [], [], None
+        return [length], [label], label
+
+    def _slice_runs(self, start, stop):
+        """Return the runs (ends, labels, aggregates) of data[start:stop], where 0 <= start and stop <= len(data)."""
+        if start >= stop:
+            return [], [], None
+        first = bisect_right(self._ends, start)
+        last = bisect_left(self._ends, stop)
+        if first == last:
+            return self._single_run(stop - start, self._labels[first])
+        ends = [end - start for end in self._ends[first:last]]
+        ends.append(stop - start)
+        return ends, self._labels[first:last + 1], None
+
+    @staticmethod
+    def _concat_runs(left, right):
+        """Return the runs (ends, labels, aggregates) of left.data + right.data."""
+        if not right._labels:
+            return left._ends, left._labels, left._sums
+        if not left._labels:
+            return right._ends, right._labels, right._sums
+        offset = left._ends[-1]
+        if left._labels[-1] == right._labels[0]:
+            # The last run of left continues into the first run of
+            # right (strings that carry the same flags end up here).
+            ends = left._ends[:-1]
+            labels = left._labels + right._labels[1:]
+        else:
+            ends = left._ends[:]
+            labels = left._labels + right._labels
+        ends.extend(end + offset for end in right._ends)
+        sums = None
+        if left._sums is not None and right._sums is not None:
+            sums = (left._sums[0] | right._sums[0],
+                    left._sums[1] or right._sums[1],
+                    left._sums[2] and right._sums[2])
+        return ends, labels, sums
+
+    def _expand(self):
+        """Return the (taints, synthesized, trusted) label of every character."""
+        labels = []
+        start = 0
+        for end, label in zip(self._ends, self._labels):
+            labels.extend([label] * (end - start))
+            start = end
+        return labels
+
+    @staticmethod
+    def _encode(labels):
+        """Return the runs (ends, labels, aggregates) of characters with the given labels."""
+        ends, runs = [], []
+        for i, label in enumerate(labels):
+            if runs and runs[-1] == label:
+                ends[-1] = i + 1
+            else:
+                ends.append(i + 1)
+                runs.append(label)
+        return ends, runs, None
+
     def _sum_taints(self):
         """Helper function to "or" (|) all taints together."""
         taints = empty_taint()
-        for taint in self.taints:
+        for taint, _, _ in self._labels:
             taints |= taint
         return taints
 
@@ -416,27 +748,43 @@ class SpliceUserString(UserString):
         """Helper function to "or" (|) all synthesis flags together."""
         synthesized = False
         # If one character is synthesized, the entire str is synthesized
-        for synthsis in self.synthesized:
+        for _, synthsis, _ in self._labels:
             synthesized |= synthsis
         return synthesized
 
     def _sum_trusted(self):
         """Helper function to "and" (&) all trusted flags together."""
         trusted = True
-        for trust in self.trusted:
+        for _, _, trust in self._labels:
             trusted &= trust
         return trusted
 
 
+def _tainted_fileno(obj, fno):
+    """
+    Return the file descriptor fno of obj (a Splice system object) as a SpliceInt
+    with the same taint information as obj. The event loop asks for the file
+    descriptor on every selector operation, so the SpliceInt is created once and
+    cached on obj until the descriptor (e.g., obj is closed) or obj's taint
+    information (e.g., obj is spliced) changes.
+    """
+    key = (fno, obj._taints, obj._trusted, obj._synthesized)
+    cached = obj.__dict__.get('_fileno')
+    if cached is None or cached[0] != key:
+        cached = obj._fileno = (key, SpliceInt(fno, taints=obj.taints, trusted=obj.trusted,
+                                               synthesized=obj.synthesized))
+    return cached[1]
+
+
 class SpliceSocket(socket.socket, SpliceAttrMixin):
     def __init__(self, *args, taints=None, trusted=True, synthesized=False, **kwargs):
         if trusted and synthesized:
             raise AttributeError("Cannot initialize a trusted and synthesized SpliceSocket object.")
         super().__init__(*args, **kwargs)
         if taints is None:
-            self._taints = empty_taint()
+            self.taints = empty_taint()
         else:
-            self._taints = taints
+            self.taints = taints
         self._trusted = trusted
         self._synthesized = synthesized
 
@@ -478,8 +826,16 @@ class SpliceSocket(socket.socket, SpliceAttrMixin):
         Return the file descriptor of the socket, and the returned
         file descriptor has the same taint information as the socket.
         """
-        fno = super().fileno()
-        return SpliceInt(fno, taints=self.taints, trusted=self.trusted, synthesized=self.synthesized)
+        return _tainted_fileno(self, super().fileno())
+
+    def use_plain_recv(self):
+        """
+        Make recv() return plain (untainted) bytes from now on. This is for a
+        transport that keeps the taint of all data it receives in one place
+        (a SpliceTaintRegion that adopts this socket), so that received chunks
+        skip the Splice runtime: recv() then is socket.socket's own (C) recv.
+        """
+        self.recv = _socket.socket.recv.__get__(self, type(self))
 
     def recv(self, buffersize):
         """Call socket.socket recv but taint the received bytes."""
@@ -514,6 +870,7 @@ class SpliceSocket(socket.socket, SpliceAttrMixin):
             pass
         finally:
             self.close()
+            self.__dict__.pop('_fileno', None)
             self.taints = empty_taint()
             self.trusted = False
             self.synthesized = True
@@ -527,9 +884,9 @@ class SpliceFileIO(io.FileIO, SpliceAttrMixin):
         super().__init__(name, mode=mode, closefd=closefd, opener=opener)
         # Set up taints and flags for io.FileIO
         if taints is None:
-            self._taints = empty_taint()
+            self.taints = empty_taint()
         else:
-            self._taints = taints
+            self.taints = taints
         self._trusted = trusted
         self._synthesized = synthesized
         self.name = SpliceMixin.to_splice(name, taints=self.taints, synthesized=self.synthesized,
@@ -540,8 +897,7 @@ class SpliceFileIO(io.FileIO, SpliceAttrMixin):
         Return the file descriptor of the SpliceFileIO, and the returned
         file descriptor has the same taint information as the SpliceFileIO.
         """
-        fno = super().fileno()
-        return SpliceInt(fno, taints=self.taints, trusted=self.trusted, synthesized=self.synthesized)
+        return _tainted_fileno(self, super().fileno())
 
     @contextmanager
     def splice(self):
@@ -553,6 +909,7 @@ class SpliceFileIO(io.FileIO, SpliceAttrMixin):
             pass
         finally:
             self.close()
+            self.__dict__.pop('_fileno', None)
             self.taints = empty_taint()
             self.trusted = False
             self.synthesized = True
@@ -566,9 +923,9 @@ class SpliceBufferedReader(io.BufferedReader, SpliceAttrMixin):
         super().__init__(raw, buffer_size)
         # Set up taints and flags for io.BufferedReader
         if taints is None:
-            self._taints = empty_taint()
+            self.taints = empty_taint()
         else:
-            self._taints = taints
+            self.taints = taints
         self._trusted = trusted
         self._synthesized = synthesized
         # The name attribute should inherit taints and flags from the BufferedReader object
@@ -593,8 +950,7 @@ class SpliceBufferedReader(io.BufferedReader, SpliceAttrMixin):
         Return the file descriptor of the SpliceBufferedReader, and the returned
         file descriptor has the same taint information as the SpliceBufferedReader.
         """
-        fno = super().fileno()
-        return SpliceInt(fno, taints=self.taints, trusted=self.trusted, synthesized=self.synthesized)
+        return _tainted_fileno(self, super().fileno())
 
     @contextmanager
     def splice(self):
@@ -606,6 +962,7 @@ class SpliceBufferedReader(io.BufferedReader, SpliceAttrMixin):
             pass
         finally:
             self.close()
+            self.__dict__.pop('_fileno', None)
             self.taints = empty_taint()
             self.trusted = False
             self.synthesized = True
@@ -619,9 +976,9 @@ class SpliceBufferedWriter(io.BufferedWriter, SpliceAttrMixin):
         super().__init__(raw, buffer_size)
         # Set up taints and flags for io.BufferedWriter
         if taints is None:
-            self._taints = empty_taint()
+            self.taints = empty_taint()
         else:
-            self._taints = taints
+            self.taints = taints
         self._trusted = trusted
         self._synthesized = synthesized
         # The name attribute should inherit taints and flags from the SpliceBufferedWriter object
@@ -642,8 +999,7 @@ class SpliceBufferedWriter(io.BufferedWriter, SpliceAttrMixin):
         Return the file descriptor of the SpliceBufferedWriter, and the returned
         file descriptor has the same taint information as the SpliceBufferedWriter.
         """
-        fno = super().fileno()
-        return SpliceInt(fno, taints=self.taints, trusted=self.trusted, synthesized=self.synthesized)
+        return _tainted_fileno(self, super().fileno())
 
     @contextmanager
     def splice(self):
@@ -655,6 +1011,7 @@ class SpliceBufferedWriter(io.BufferedWriter, SpliceAttrMixin):
             pass
         finally:
             self.close()
+            self.__dict__.pop('_fileno', None)
             self.taints = empty_taint()
             self.trusted = False
             self.synthesized = True
@@ -693,9 +1050,9 @@ class SplicePopen(subprocess.Popen, SpliceAttrMixin):
                          pass_fds=pass_fds, encoding=encoding, errors=errors)
         # Set up taints and flags for Popen
         if taints is None:
-            self._taints = empty_taint()
+            self.taints = empty_taint()
         else:
-            self._taints = taints
+            self.taints = taints
         self._trusted = trusted
         self._synthesized = synthesized
         self.dp_fn = dp_fn
@@ -777,9 +1134,9 @@ class SpliceTask(asyncio.Task, SpliceAttrMixin):
         super().__init__(coro, loop=loop, name=name)
         # Set up taints and flags for Task
         if taints is None:
-            self._taints = empty_taint()
+            self.taints = empty_taint()
         else:
-            self._taints = taints
+            self.taints = taints
         self._trusted = trusted
         self._synthesized = synthesized
 
@@ -798,5 +1155,59 @@ class SpliceTask(asyncio.Task, SpliceAttrMixin):
             self.trusted = False
 
 
+class SpliceTaintRegion(SpliceAttrMixin):
+    """
+    A single taint record shared by all data flowing through one direction of a
+    connection (e.g., everything a transport receives from a client). Instead of
+    wrapping every received chunk in a SpliceBytes, a transport exposes its region
+    through get_extra_info('taint_region') and hands plain bytes to its protocol.
+    A buffer becomes a real Splice object only when it leaves the connection's data
+    plane (e.g., when it is stored in a long-lived structure) by calling materialize().
+
+    Data in a region is *never* trusted. Protocols must call materialize() with
+    trusted=True explicitly, after performing defensive programming on the data.
+    """
+    def __init__(self, taints=None, synthesized=False):
+        if taints is None:
+            self.taints = empty_taint()
+        else:
+            self.taints = taints
+        self._trusted = False
+        self._synthesized = synthesized
+
+    def adopt(self, data):
+        """
+        Take on the taints of (tainted) data if the region has no taints yet,
+        e.g., when the first chunk arrives from a tainted socket. A region that
+        has been spliced stays synthesized and untainted.
+        """
+        if not self.taints and not self.synthesized and hasattr(data, 'taints'):
+            self.taints = data.taints
+            self.synthesized = data.synthesized
+
+    def materialize(self, value, trusted=False):
+        """
+        Convert value (data received from the region) to a Splice object tainted by
+        the region. Once the region has been spliced, value is synthesized and
+        therefore never trusted, whatever trusted says.
+        """
+        return SpliceMixin.to_splice(value, trusted=trusted and not self.synthesized,
+                                     synthesized=self.synthesized, taints=self.taints, constraints=[])
+
+    @contextmanager
+    def splice(self):
+        """See comments above in SpliceSocket. Data received after
+        deletion is materialized as synthesized and untainted.
+        """
+        try:
+            yield self
+        except:
+            pass
+        finally:
+            self.taints = empty_taint()
+            self.synthesized = True
+            self.trusted = False
+
+
 if __name__ == "__main__":
     pass
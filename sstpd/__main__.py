@@ -15,6 +15,9 @@ except ImportError:
 from . import __doc__
 from . import certtool
 from .sstp import SSTPProtocolFactory
+from . import replace
+from .deletion import start_executor, shutdown_executor
+from .admin import start_admin_server
 from .address import IPPool
 
 # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
@@ -79,10 +82,35 @@ def _get_args():
     parser.add_argument('--ciphers', metavar="CIPHER-LIST", help='Custom OpenSSL cipher suite. See ciphers(1).')
     parser.add_argument('-v', '--log-level', type=int, metavar='LOG-LEVEL',
                         help="1 to 50. Default 20, debug 10, verbose 5.")
+    parser.add_argument('--synthesis-workers', type=int, metavar='N',
+                        help="[SPLICE] Number of worker processes that synthesize "
+                             "objects during deletion. Default to the number of CPUs.")
+    parser.add_argument('--replace-backend', choices=replace.BACKENDS, metavar='BACKEND',
+                        help="[SPLICE] How references to synthesized objects are found: "
+                             "'guppy' (full heap traversal) or 'gc' (gc.get_referrers). "
+                             "Default to guppy.")
+    parser.add_argument('--admin-socket', metavar='PATH',
+                        help="[SPLICE] Path of the unix socket that accepts deletion "
+                             "requests (see sstpd/admin.py). Deletion is disabled if not given.")
+    parser.add_argument('--fork-planning', action='store_true',
+                        help="[SPLICE] Plan deletions (object discovery, constraint "
+                             "concretization and synthesis) in a forked child process.")
+    parser.add_argument('--audit-deletions', action='store_true',
+                        help="[SPLICE] Audit every deletion: check that no object or reference "
+                             "it touched still holds the user's data, and report survivors.")
 
     args = parser.parse_args()
     args.log_level = int(args.log_level)
     args.listen_port = int(args.listen_port)
+    if args.synthesis_workers is not None:
+        args.synthesis_workers = int(args.synthesis_workers)
+    # Flags read from the config file are strings (e.g., 'false').
+    for flag in ('fork_planning', 'audit_deletions'):
+        value = getattr(args, flag)
+        if isinstance(value, str):
+            if value.lower() not in SafeConfigParser.BOOLEAN_STATES:
+                parser.error('%s must be a boolean, not %r' % (flag, value))
+            setattr(args, flag, SafeConfigParser.BOOLEAN_STATES[value.lower()])
     args.no_ssl = args.proxy_protocol or args.no_ssl
     return args
 
@@ -111,6 +139,10 @@ def main():
                         # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
                         format='%(asctime)s %(levelname)-s: %(message)s')
     logging.addLevelName(5, 'VERBOSE')
+    # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+    if args.replace_backend:
+        replace.set_backend(args.replace_backend)
+    # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
 
     if args.remote:
         ippool = IPPool(args.remote, args.range)
@@ -166,7 +198,21 @@ def main():
         #                           ssl=ssl_ctx)
         coro = loop.create_server(factory, sock=sock, ssl=ssl_ctx)
         # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+    # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+    # Synthesis workers are started by a forkserver, which
+    # must not inherit client sockets (see deletion.py).
+    if __splice__ and args.admin_socket:
+        start_executor()
+    # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
     server = loop.run_until_complete(coro)
+    # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+    admin_server = None
+    if __splice__ and args.admin_socket:
+        admin_server = loop.run_until_complete(start_admin_server(args.admin_socket,
+                                                                  args.synthesis_workers,
+                                                                  args.fork_planning,
+                                                                  args.audit_deletions))
+    # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
 
     if not on_unix_socket:
         # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
@@ -190,6 +236,11 @@ def main():
     except KeyboardInterrupt:
         logging.info('Exit by interrupt')
     finally:
+        # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+        if admin_server is not None:
+            admin_server.close()
+        shutdown_executor()
+        # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
         loop.close()
 
 if __name__ == '__main__':
@@ -0,0 +1,176 @@
+"""
+Splice admin control socket. Deletion requests are sent to a unix socket
+that only the server's administrator can reach, instead of in-band over the
+tunnels (where any client could request a deletion, and every packet would
+have to be checked for a command).
+
+A request is one line, either plain text:
+
+    DELETE <taint> [<taint> ...] [AUDIT]
+
+or a JSON object:
+
+    {"delete": [<taint>, ...], "audit": true}
+
+The users of all taints in a request are deleted in one batch: their
+objects are discovered, synthesized and replaced together. AUDIT (or "audit") asks for the deletion to be audited (see
+DeletionJob._audit()); the server's default is used if it is omitted.
+The server answers every request with a stream of JSON objects, one per
+line: a "progress" event whenever the deletion enters a new phase, then a
+"done" event with the final statistics of the batch, the same statistics
+per user ("users", keyed by taint) and, if audited, the survivors, or an
+"error" event. Requests are handled one at a time, in the order they
+arrive.
+"""
+import os
+import json
+import socket
+import asyncio
+import logging
+
+from .deletion import DeletionJob
+
+from asyncio.splice.identity import empty_taint, taint_scope
+
+
+def parse_request(line):
+    """
+    Return the list of taints requested for deletion by a request line and
+    whether the deletion should be audited (None if the request does not say).
+    """
+    line = line.strip()
+    if line.startswith(b'{'):
+        request = json.loads(line.decode())
+        taints = request.get('delete') if isinstance(request, dict) else None
+        if not isinstance(taints, list):
+            raise ValueError('a JSON request must be {"delete": [<taint>, ...]}')
+        audit = request.get('audit')
+        if audit is not None and not isinstance(audit, bool):
+            raise ValueError('"audit" must be true or false')
+        # bool is a subclass of int, but true is not a taint.
+        if any(type(taint) is not int for taint in taints):
+            raise ValueError('taints must be integers')
+    else:
+        words = line.decode().split()
+        if not words or words[0].upper() != 'DELETE':
+            raise ValueError('unknown command (expected DELETE <taint> [<taint> ...] [AUDIT])')
+        taints = words[1:]
+        audit = None
+        if taints and taints[-1].upper() == 'AUDIT':
+            taints.pop()
+            audit = True
+        taints = [int(taint) for taint in taints]
+    if not taints:
+        raise ValueError('no taint given')
+    # A taint given twice is deleted once.
+    taints = list(dict.fromkeys(taints))
+    if any(taint <= 0 for taint in taints):
+        raise ValueError('taints must be positive')
+    # A user's taint is a single bit; a combination of bits is not a user.
+    if any(taint & (taint - 1) for taint in taints):
+        raise ValueError('a taint must have a single bit set')
+    return taints, audit
+
+
+class AdminProtocol(asyncio.Protocol):
+    """One connection to the admin socket."""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while b'\n' in self.buffer:
+            line, self.buffer = self.buffer.split(b'\n', 1)
+            if not line.strip():
+                continue
+            try:
+                taints, audit = parse_request(line)
+            except ValueError as e:
+                self.send(event='error', message=str(e))
+                continue
+            asyncio.ensure_future(self.server.delete(taints, self, audit))
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def send(self, **event):
+        """Send an event to the client (if it is still connected)."""
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(json.dumps(event).encode() + b'\n')
+
+
+class AdminServer(object):
+    """Serve deletion requests on the admin socket."""
+
+    def __init__(self, path, synthesis_workers=None, fork_planning=False, audit=False):
+        self.path = path
+        self.synthesis_workers = synthesis_workers
+        self.fork_planning = fork_planning
+        # Whether deletions are audited unless a request says otherwise
+        self.audit = audit
+        self.logging = logging.getLogger('SSTP')
+        # Deletions run one at a time.
+        self.lock = asyncio.Lock()
+        self.server = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        # Only the server's user can send deletion requests. The socket is
+        # bound with those permissions, so that no other user can connect
+        # before they are set.
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(umask)
+        self.server = await asyncio.get_event_loop().create_unix_server(lambda: AdminProtocol(self), sock=sock)
+        self.logging.info('[splice] Admin socket listening on %s', self.path)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    async def delete(self, taints, client, audit=None):
+        """Delete the users with taints and report progress and statistics to client."""
+        def on_progress(job):
+            client.send(event='progress', **job.progress())
+
+        if audit is None:
+            audit = self.audit
+        async with self.lock:
+            self.logging.info('[splice] Deletion requested for users %s', taints)
+            job = DeletionJob(taints, self.logging, self.synthesis_workers, on_progress=on_progress,
+                              fork=self.fork_planning, audit=audit)
+            try:
+                # Deletion runs on behalf of no user.
+                with taint_scope(empty_taint()):
+                    stats = await job.run()
+            except Exception as e:
+                self.logging.exception('[splice] Deletion of users %s failed', taints)
+                client.send(event='error', taints=taints, message=str(e))
+                return
+            if audit:
+                client.send(event='done', taints=taints, stats=stats, users=job.per_user, survivors=job.survivors)
+            else:
+                client.send(event='done', taints=taints, stats=stats, users=job.per_user)
+
+
+async def start_admin_server(path, synthesis_workers=None, fork_planning=False, audit=False):
+    """Start serving deletion requests on the unix socket at path and return the AdminServer."""
+    server = AdminServer(path, synthesis_workers, fork_planning, audit)
+    await server.start()
+    return server
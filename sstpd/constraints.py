@@ -1,7 +1,12 @@
 """Symbolic data-structure-level constraint parsing for constraint concretization at deletion time. """
-from arpeggio import Optional, ZeroOrMore, OneOrMore, EOF, PTNodeVisitor
+from arpeggio import Optional, ZeroOrMore, OneOrMore, EOF, PTNodeVisitor, ParserPython, visit_parse_tree
 from arpeggio import RegExMatch as _
 
+# Compiled symbolic constraints: constraint string -> evaluator (see compile_symbolic()).
+_compiled_symbolic = dict()
+# The parser of the symbolic grammar is built on first use.
+_parser = None
+
 
 def merge_constraints(constraints, other):
     """Merge two constraints."""
@@ -168,3 +173,185 @@ class SymbolicVisitor(PTNodeVisitor):
         if self.dg:
             merged_constraints = merge_constraints([{'conds': self.cond_constraints}], merged_constraints)
         self.constraints = merged_constraints
+
+
+class _Evaluation(object):
+    """The state of one evaluation of a compiled symbolic constraint (see SymbolicVisitor)."""
+    __slots__ = ('obj', 'struct', 'dg', 'cond_constraints')
+
+    def __init__(self, obj, struct, dg):
+        self.obj = obj
+        self.struct = struct
+        self.dg = dg
+        self.cond_constraints = []
+
+
+def _evaluate_children(children, ev):
+    """
+    Evaluate compiled children in order. Like visit_parse_tree(), children
+    that evaluate to None are dropped; literals are kept as they are.
+    """
+    values = []
+    for child in children:
+        if callable(child):
+            child = child(ev)
+            if child is None:
+                continue
+        values.append(child)
+    return values
+
+
+class SymbolicCompiler(PTNodeVisitor):
+    """
+    Compile a parsed tree of symbolic constraints into a tree of closures.
+    Each closure takes an _Evaluation and computes what the corresponding
+    visit_*() method of SymbolicVisitor computes, so the tree is parsed
+    only once no matter how many objects are concretized against it.
+    """
+    def visit_condition(self, node, children):
+        op = children[0]
+        args = list(children[1:])
+
+        def condition(ev):
+            values = _evaluate_children(args, ev)
+            try:
+                if values:
+                    val = getattr(ev.struct, op)(*values)
+                    if ev.dg:
+                        ev.cond_constraints.extend(values)
+                else:
+                    val = getattr(ev.struct, op)(ev.obj)
+            except AttributeError:
+                raise AttributeError("Operation {} is not defined".format(op))
+            return val
+        return condition
+
+    def visit_constraint(self, node, children):
+        op = str(children[0])
+        args = list(children[1:])
+        has_func = 'func_name' in children.results
+        func_names = list(children.results.get('func_name', []))
+
+        def constraint(ev):
+            values, conditions = [], []
+            for arg in args:
+                if callable(arg):
+                    arg = arg(ev)
+                    if arg is None:
+                        continue
+                    conditions.append(arg)
+                values.append(arg)
+            if not values:
+                return None
+            elif len(values) == 1:
+                if has_func:
+                    try:
+                        val = getattr(ev.struct, str(values[0]))
+                    except AttributeError:
+                        raise AttributeError("Function {} is not defined".format(values[0]))
+                elif values[0] is not False:
+                    val = values[0]
+                else:
+                    return None
+            else:
+                val = []
+                for func in func_names:
+                    try:
+                        val.append(getattr(ev.struct, func))
+                    except AttributeError:
+                        raise AttributeError("Function {} is not defined".format(func))
+                val.extend(conditions)
+                val = tuple(val)
+            return {op: val}
+        return constraint
+
+    def visit_cnf(self, node, children):
+        parts = list(children)
+
+        def cnf(ev):
+            constraints = {}
+            for child in _evaluate_children(parts, ev):
+                if isinstance(child, dict):
+                    for key in child:
+                        if key in constraints:
+                            constraints[key].append(child[key])
+                        else:
+                            constraints[key] = [child[key]]
+            return constraints
+        return cnf
+
+    def visit_dnf(self, node, children):
+        parts = list(children)
+
+        def dnf(ev):
+            return [child for child in _evaluate_children(parts, ev) if isinstance(child, dict)]
+        return dnf
+
+    def visit_conditioned_dnf(self, node, children):
+        parts = list(children)
+        has_else = "else" in node
+
+        def conditioned_dnf(ev):
+            values = _evaluate_children(parts, ev)
+            if ev.dg:
+                merged_constraints = []
+                for i in range(0, len(values) - 1, 2):
+                    merged_constraints = merge_constraints(values[i+1], merged_constraints)
+                return merged_constraints
+            for i in range(0, len(values) - 1, 2):
+                if values[i]:
+                    return values[i+1]
+            if has_else:
+                return values[-1]
+            return []
+        return conditioned_dnf
+
+    def visit_symbolic(self, node, children):
+        parts = list(children)
+
+        def symbolic_constraints(obj, struct, dg=False):
+            ev = _Evaluation(obj, struct, dg)
+            merged_constraints = []
+            for child in _evaluate_children(parts, ev):
+                if isinstance(child, list):
+                    merged_constraints = merge_constraints(child, merged_constraints)
+            if dg:
+                merged_constraints = merge_constraints([{'conds': ev.cond_constraints}], merged_constraints)
+            return merged_constraints
+        return symbolic_constraints
+
+
+def compile_symbolic(constraint_str):
+    """
+    Return an evaluator for the symbolic constraint string. The evaluator
+    takes (obj, struct, dg=False) and returns the same concrete constraints
+    as SymbolicVisitor(obj, struct, dg).constraints after visiting the parse
+    tree. A data structure's symbolic constraints never change, so each
+    distinct string is parsed and compiled only once.
+    """
+    global _parser
+    evaluator = _compiled_symbolic.get(constraint_str)
+    if evaluator is None:
+        if _parser is None:
+            _parser = ParserPython(symbolic)
+        parse_tree = _parser.parse(constraint_str)
+        evaluator = visit_parse_tree(parse_tree, SymbolicCompiler())
+        _compiled_symbolic[constraint_str] = evaluator
+    return evaluator
+
+
+def concretize_symbolic(constraint_str, obj, struct, dg=False):
+    """Concretize the symbolic constraint string for obj in its enclosing data structure struct."""
+    return compile_symbolic(constraint_str)(obj, struct, dg)
+
+
+def symbolic_constraint(constraint_str, struct):
+    """
+    Return a constraint callback (see SpliceMixin.constraints) that
+    concretizes the symbolic constraint string for an object in struct.
+    """
+    evaluator = compile_symbolic(constraint_str)
+
+    def constraint(obj, dg=False):
+        return evaluator(obj, struct, dg)
+    return constraint
@@ -0,0 +1,804 @@
+"""
+Splice deletion. Deleting a user's data is a pipeline of three steps:
+constraints of the user's objects are concretized on the event loop
+thread, the independent synthesis jobs are solved by a pool of worker
+processes, and the synthesized objects replace the original objects
+once all results come back. Work on the event loop thread is done in
+short time slices (see DeletionJob), so other connections are served
+while a deletion runs. Alternatively, the first two steps can be done
+by a forked child against a copy-on-write snapshot of the heap (see
+write_plan()), so that the serving process only applies the result.
+"""
+import gc
+import os
+import time
+import pickle
+import signal
+import struct
+import asyncio
+import multiprocessing
+from multiprocessing import forkserver
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import replace
+from .constraints import merge_constraints
+from .synthesis import pooled_synthesizer, dependencies_from_constraints
+
+from asyncio.splice.splice import SpliceAttrMixin, SpliceMixin
+from asyncio.splice.identity import empty_taint
+from asyncio.splice.registry import taint_registry
+
+# Worker processes that solve synthesis jobs. The pool is created on
+# the first deletion, so that workers are started only if they are used.
+# Workers are started by a forkserver, a clean process started (see
+# start_executor()) before the server accepts any client: a worker forked
+# from the server would keep copies of all of its file descriptors, so a
+# socket closed by the server (e.g., when its user is deleted) would never
+# be closed for the client, and pppd would never see EOF on its pipes.
+_executor = None
+_mp_context = multiprocessing.get_context('forkserver')
+
+
+def start_executor():
+    """Start the forkserver of the synthesis workers (call it before any client is accepted)."""
+    _mp_context.set_forkserver_preload([__name__])
+    forkserver.ensure_running()
+
+
+def get_executor(max_workers=None):
+    """Return the process pool of synthesis workers (max_workers defaults to the number of CPUs)."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=_mp_context)
+    return _executor
+
+
+def shutdown_executor():
+    """Shut down the process pool of synthesis workers, if it has been created, and wait for its workers."""
+    global _executor
+    if _executor is not None:
+        # Waiting lets the pool's queue manager thread finish before the
+        # interpreter exits; otherwise it races interpreter shutdown.
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _substitute(condition, values):
+    """Substitute synthesized values (see concretize_and_merge_constraints()) in a condition."""
+    if id(condition) in values:
+        return values[id(condition)]
+    if isinstance(condition, tuple):
+        return tuple(_substitute(c, values) for c in condition)
+    return condition
+
+
+def concretize_and_merge_constraints(obj, unsplicify=True, values=None):
+    """
+    Return a set of concrete constraints for a Splice object.
+    For multiprocess to work, objects within the constraints
+    must be unsplicified. However, when building dependency
+    graph, objects need to keep their actual types. Therefore,
+    we make unsplificy an option in the argument. values, if
+    given, maps the id of an object that has already been
+    synthesized to its synthesized value, which replaces the
+    object wherever it appears in the constraints.
+    """
+    # Concretize constraints for obj using symbolic
+    # constraints from its enclosing data structure.
+    concrete_constraints = []
+    # Each constraint in obj.constraints is a callable that takes
+    # the object as the only argument. Each callback function
+    # returns concrete constraints in disjunctive normal form.
+    for constraint in obj.constraints:
+        # NOTE: not unsplicify is a boolean which is used to signify
+        # that we are building constraints to create dependency graph
+        # (since we do not unsplicify when we build the graph).
+        obj_constraints = constraint(obj, not unsplicify)
+        if unsplicify:
+            # Unsplificy all Splice objects that are part of the constraint
+            for obj_constraint in obj_constraints:
+                for k, conditions in obj_constraint.items():
+                    new_conditions = []
+                    for condition in conditions:
+                        if values:
+                            condition = _substitute(condition, values)
+                        if isinstance(condition, SpliceMixin):
+                            new_conditions.append(condition.unsplicify())
+                        else:
+                            new_conditions.append(condition)
+                    obj_constraint[k] = new_conditions
+            concrete_constraints.append(obj_constraints)
+        else:
+            concrete_constraints.append(obj_constraints)
+    # Merge all concrete constraints, if needed
+    if not concrete_constraints:
+        merged_constraints = None
+    else:
+        merged_constraints = concrete_constraints[0]
+        for concrete_constraint in concrete_constraints[1:]:
+            merged_constraints = merge_constraints(merged_constraints, concrete_constraint)
+    return merged_constraints
+
+
+def dependency_levels(candidates):
+    """
+    Order the objects to be synthesized by their dependencies. candidates is a
+    list of (obj, constraints) where constraints are obj's constraints built for
+    the dependency graph (i.e., concretize_and_merge_constraints(obj, False)).
+    An object depends on every other candidate whose value feeds its constraints
+    (see dependencies_from_constraints()) and must be synthesized after it, so
+    that its constraints see the synthesized value instead of a value about to
+    be replaced. Return a list of levels (lists of objects) in topological order;
+    the objects of a level are independent of each other and can be solved in
+    parallel. A dependency cycle (e.g., adjacent keys in a sorted structure, each
+    bounded by the previous and the next) is broken in a fixed order: its first
+    object (in the order of candidates) goes to a level of its own, so that the
+    rest of the cycle is solved after it and sees its synthesized value.
+    """
+    by_id = {id(obj): obj for obj, _ in candidates}
+    waiting = dict()        # id(obj) -> number of dependencies not yet placed in a level
+    dependents = dict()     # id(obj) -> ids of objects that depend on obj
+    level = []
+    for obj, constraints in candidates:
+        deps = {id(dep) for dep in dependencies_from_constraints(constraints, obj.taints)
+                if id(dep) in by_id and dep is not obj}
+        waiting[id(obj)] = len(deps)
+        for dep in deps:
+            dependents.setdefault(dep, []).append(id(obj))
+        if not deps:
+            level.append(obj)
+    levels = []
+    while True:
+        while level:
+            levels.append(level)
+            next_level = []
+            for obj in level:
+                del waiting[id(obj)]
+                for oid in dependents.get(id(obj), ()):
+                    # A dependent may already be placed (see below).
+                    if oid in waiting:
+                        waiting[oid] -= 1
+                        if not waiting[oid]:
+                            next_level.append(by_id[oid])
+            level = next_level
+        if not waiting:
+            return levels
+        # Every object left waiting is on (or depends on) a cycle.
+        level = [by_id[next(iter(waiting))]]
+
+
+def synthesize_obj(obj_type, constraints):
+    """
+    Synthesize a new object based on its constraints.
+    It is possible that synthesis does not succeed because
+    for example constraints have conflicts. In such a case,
+    None is returned.
+    """
+    if constraints is not None:
+        synthesizer = pooled_synthesizer(obj_type)
+        # start_time = time.perf_counter()
+        synthesized_obj = synthesizer.splice_synthesis(constraints)
+        # logger.info("Synthesizing one object takes: {}".format(time.perf_counter() - start_time))
+        return synthesized_obj
+    return None
+
+
+def replace_obj(obj, references):
+    """Redirect all references to obj. If redirection succeeds, return True; otherwise, False."""
+    # Perform object replacement for objects that have a synthesized version
+    # We use guppy. Note that using ctypes.memmove does not seem to work (leads to segfault).
+    # ctypes.memmove(id(obj), id(synthesized_obj), object.__sizeof__(obj))
+    # ctypes.memmove ref: https://docs.python.org/2/library/ctypes.html#ctypes.memmove
+    try:
+        replace.replace(obj, references)
+        return True
+    except:
+        # Replacement should not fail, but just in case it fails, we want to know.
+        print("**** replacing {} failed ****".format(obj))
+    return False
+
+
+def solve(obj_type, constraints):
+    """
+    Synthesis job run by a worker process. A Splice object does not
+    keep its taint registration across processes, so the worker returns
+    the plain synthesized value (or None) and the caller re-wraps it.
+    """
+    synthesized_obj = synthesize_obj(obj_type, constraints)
+    if synthesized_obj is None:
+        return None
+    return synthesized_obj.unsplicify()
+
+
+def owned_by(taints, mask):
+    """
+    Return whether an object with taints belongs only to the users whose taints
+    are in mask, i.e., it is tainted and every one of its taints is in mask. An
+    object tainted by several users is deleted only if all of them are deleted.
+    """
+    return bool(taints) and not taints & ~mask
+
+
+def flag_obj(obj):
+    """Mark obj as synthesized when no synthesized object can replace it."""
+    obj.trusted = False
+    obj.synthesized = True
+    obj.taints = empty_taint()
+    obj.constraints = []
+
+
+# A plan record is (id(obj), type name, action, value), pickled and prefixed with its length.
+_RECORD_SIZE = struct.Struct('!I')
+
+
+def write_plan(sids, fd, max_workers=None):
+    """
+    Plan the deletion of all objects tainted by (and only by) the users whose
+    taints are in the set sids (see owned_by()), and write the plan to the file descriptor fd as a stream of
+    records (see _RECORD_SIZE). The action of a record is 'splice' (a system
+    object), 'flag' (no synthesized object can replace the object) or
+    'replace' (value is the synthesized value); a final 'end' record marks
+    a complete plan. Nothing is deleted: this runs in a forked child (see
+    DeletionJob), where object ids are handles to the parent's objects.
+    """
+    global _executor
+    # The parent's worker pool does not survive fork(), and the parent's
+    # forkserver is not the child's to use, so the child forks its own
+    # workers. They hold the parent's descriptors only while the child lives.
+    _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork'))
+    with os.fdopen(fd, 'wb') as out:
+        def emit(oid, type_name, action, value=None):
+            record = pickle.dumps((oid, type_name, action, value), pickle.HIGHEST_PROTOCOL)
+            out.write(_RECORD_SIZE.pack(len(record)))
+            out.write(record)
+
+        candidates = []
+        mask = 0
+        for sid in sids:
+            mask |= sid
+        for obj in taint_registry.objects(mask):
+            if not owned_by(obj.taints, mask):
+                continue
+            if isinstance(obj, SpliceAttrMixin):
+                emit(id(obj), type(obj).__name__, 'splice')
+                continue
+            constraints = concretize_and_merge_constraints(obj, unsplicify=False)
+            if constraints is None:
+                emit(id(obj), type(obj).__name__, 'flag')
+            else:
+                candidates.append((obj, constraints))
+        out.flush()
+        executor = get_executor(max_workers)
+        values = dict()
+        for level in dependency_levels(candidates):
+            futures = dict()
+            for obj in level:
+                constraints = concretize_and_merge_constraints(obj, unsplicify=True, values=values)
+                futures[executor.submit(solve, type(obj), constraints)] = (obj, constraints)
+            for future in as_completed(futures):
+                obj, constraints = futures[future]
+                try:
+                    value = future.result()
+                except Exception:
+                    value = solve(type(obj), constraints)
+                if value is not None:
+                    values[id(obj)] = value
+                emit(id(obj), type(obj).__name__, 'flag' if value is None else 'replace', value)
+                out.flush()
+        executor.shutdown()
+        emit(0, '', 'end')
+
+
+class DeletionJob(object):
+    """
+    A resumable deletion of all objects tainted by (and only by) the user with
+    taint sid (or, if sid is a collection of taints, by those users; see
+    owned_by()). A batch of users costs one discovery, one search and one set
+    of synthesis jobs, and its results are also counted per user (see
+    per_user). The job runs as a coroutine on the event loop, but never holds
+    the loop for longer than (roughly) one time slice: work on the event loop
+    thread is done in slices of slice_time seconds, and the job yields to the
+    loop between slices, so that the tunnels of other users keep flowing while
+    an erasure runs. Synthesis jobs are solved by worker processes meanwhile.
+
+    A deletion goes through the following phases:
+      discover    take a snapshot of the user's objects from the taint registry
+      concretize  delete system objects and build the dependency graph of the others
+      solve       synthesize objects in worker processes, one dependency level
+                  at a time (see dependency_levels())
+      search      find the references to the original objects
+      replace     redirect them to the synthesized objects and flag the originals
+      verify      a final consistency pass: objects tainted by the user since the
+                  snapshot (e.g., created by the user's connection while the job
+                  ran) are deleted or flagged
+      audit       (only if audit is True) check that nothing the deletion touched
+                  still holds the user's data (see _audit())
+
+    If fork is True, the discover, concretize and solve phases are replaced by
+    a single plan phase: a forked child plans the deletion against its copy-on-
+    write snapshot of the heap (see write_plan()) and streams the plan back.
+    The parent only applies the plan, after checking that each object id still
+    refers to a live object of the same type and with the same taint.
+    """
+    SLICE_TIME = 0.002
+    SCAN_CHUNK = 512        # number of heap objects scanned at a time in a batch search
+    PHASES = ('pending', 'discover', 'concretize', 'solve', 'plan', 'search', 'replace', 'verify', 'audit',
+              'done')
+
+    def __init__(self, sid, logging, max_workers=None, slice_time=None, on_progress=None, fork=False,
+                 audit=False):
+        """on_progress, if given, is called with the job whenever it enters a new phase."""
+        self.sids = frozenset([sid] if isinstance(sid, int) else sid)
+        self.mask = 0
+        for taint in self.sids:
+            self.mask |= taint
+        self.users = ', '.join(str(taint) for taint in sorted(self.sids))
+        self.logging = logging
+        self.max_workers = max_workers
+        self.slice_time = slice_time or self.SLICE_TIME
+        self.on_progress = on_progress
+        self.fork = fork and hasattr(os, 'fork')
+        # stale counts plan records whose object is gone or changed before the plan was applied.
+        self.stats = dict(system=0, synthesized=0, flagged=0, leftover=0, stale=0)
+        # taint -> the number of objects deleted per kind that the user had (an
+        # object tainted by several users of the batch is counted for each).
+        self.per_user = {taint: dict(system=0, synthesized=0, flagged=0, leftover=0) for taint in self.sids}
+        self.phase = 'pending'
+        self.total = 0          # number of objects in the current phase
+        self.processed = 0      # number of objects processed in the current phase
+        self.slices = 0         # number of slices run on the event loop thread
+        self.max_slice_time = 0.0
+        self.start_time = None
+        self._slice_start = None
+        self.epoch = None       # taint registry epoch started by the job's snapshot
+        self.audit = audit
+        # For the audit: the objects the job deleted and the references it redirected
+        self._erased = []
+        self._references = []
+        # (kind, type name, detail) of everything the audit found still holding the user's data
+        self.survivors = []
+
+    def progress(self):
+        """Return a snapshot of the job's progress."""
+        return dict(phase=self.phase, processed=self.processed, total=self.total, slices=self.slices,
+                    max_slice_time=self.max_slice_time,
+                    elapsed=time.perf_counter() - self.start_time if self.start_time is not None else 0.0,
+                    **self.stats)
+
+    def _enter(self, phase, total=0):
+        self.phase = phase
+        self.total = total
+        self.processed = 0
+        self.logging.info("[splice] Deletion of user {}: {} ({} objects, {:.3f}s elapsed)"
+                          .format(self.users, phase, total, time.perf_counter() - self.start_time))
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def _out_of_time(self):
+        return time.perf_counter() - self._slice_start >= self.slice_time
+
+    async def _next_slice(self):
+        """End the current slice and yield to the event loop."""
+        self.slices += 1
+        self.max_slice_time = max(self.max_slice_time, time.perf_counter() - self._slice_start)
+        await asyncio.sleep(0)
+        self._slice_start = time.perf_counter()
+
+    async def _run_sliced(self, items, step):
+        """Call step(item) for every item, yielding to the event loop whenever a slice is used up."""
+        for item in items:
+            step(item)
+            self.processed += 1
+            if self._out_of_time():
+                await self._next_slice()
+
+    async def run(self):
+        """Run the job to completion and return a dict of the number of objects deleted per kind."""
+        self.start_time = self._slice_start = time.perf_counter()
+        if self.fork:
+            replacements = await self._plan_in_fork()
+        else:
+            replacements = await self._plan()
+        await self._replace(replacements)
+        del replacements
+        await self._verify()
+        if self.audit:
+            await self._audit()
+        self._enter('done')
+        self.slices += 1
+        self.max_slice_time = max(self.max_slice_time, time.perf_counter() - self._slice_start)
+        self.logging.info("[splice] Deletion of user {} takes {:.3f}s in {} slices (longest: {:.2f}ms): {}"
+                          .format(self.users, time.perf_counter() - self.start_time, self.slices,
+                                  self.max_slice_time * 1000, self.stats))
+        if len(self.per_user) > 1:
+            for taint, counts in sorted(self.per_user.items()):
+                self.logging.info("[splice] Deletion of user {}: {}".format(taint, counts))
+        return self.stats
+
+    async def _plan(self, skip=()):
+        """
+        Discover the user's objects (except those whose ids are in skip), delete
+        system objects, flag objects that cannot be synthesized, and solve the
+        synthesis jobs of the others in worker processes. Return a list of
+        (original object, synthesized object) replacements.
+        """
+        loop = asyncio.get_event_loop()
+
+        # Only visit objects that carry the user's taint bit instead
+        # of walking the entire heap (i.e., gc.get_objects()). The
+        # snapshot starts a new registry epoch (see _verify()).
+        self._enter('discover')
+        self.epoch = taint_registry.advance_epoch()
+        objs = taint_registry.objects(self.mask)
+
+        candidates = []
+
+        def concretize(obj):
+            if not owned_by(obj.taints, self.mask) or id(obj) in skip:
+                return
+            if isinstance(obj, SpliceAttrMixin):
+                with obj.splice() as resource:
+                    # splice() will handle deletion automatically.
+                    self._count('system', obj)
+                self._erase(obj)
+                return
+            # Constraints for the dependency graph keep the objects they refer to.
+            constraints = concretize_and_merge_constraints(obj, unsplicify=False)
+            if constraints is None:
+                # No synthesized object can be produced, so the best we can do is to change object attributes.
+                self._count('flagged', obj)
+                flag_obj(obj)
+                self._erase(obj)
+            else:
+                candidates.append((obj, constraints))
+
+        self._enter('concretize', len(objs))
+        await self._run_sliced(objs, concretize)
+        del objs
+        levels = dependency_levels(candidates)
+        del candidates
+
+        # Objects are synthesized level by level, so that an object's constraints
+        # are concretized with the synthesized values of the objects it depends
+        # on. The event loop is free while the workers solve a level.
+        executor = get_executor(self.max_workers)
+        values = dict()         # id(obj) -> synthesized value
+        replacements = []
+        for i, level in enumerate(levels):
+            self._enter('solve', len(level))
+            if len(levels) > 1:
+                self.logging.info("[splice] Deletion of user {}: dependency level {} of {}"
+                                  .format(self.users, i + 1, len(levels)))
+            jobs = []
+            await self._run_sliced(level, lambda obj: jobs.append(
+                (obj, concretize_and_merge_constraints(obj, unsplicify=True, values=values))))
+            futures = []
+            await self._run_sliced(jobs, lambda job: futures.append(loop.run_in_executor(executor, solve,
+                                                                                           type(job[0]), job[1])))
+            await self._next_slice()
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            self._slice_start = time.perf_counter()
+
+            def rewrap(job_and_value):
+                (obj, constraints), value = job_and_value
+                if isinstance(value, BaseException):
+                    # The job never made it to (or back from) a worker.
+                    value = solve(type(obj), constraints)
+                if value is None:
+                    self._count('flagged', obj)
+                    flag_obj(obj)
+                    self._erase(obj)
+                else:
+                    values[id(obj)] = value
+                    replacements.append((obj, SpliceMixin.to_splice(value, False, True, empty_taint(), [])))
+
+            await self._run_sliced(zip(jobs, results), rewrap)
+            del jobs, futures, results
+        return replacements
+
+    async def _plan_in_fork(self):
+        """
+        Fork a child that plans the deletion (see write_plan()) and apply its plan
+        as it streams in: system objects are spliced and objects that cannot be
+        synthesized are flagged right away. Return a list of (original object,
+        synthesized object) replacements.
+        """
+        self._enter('plan')
+        replacements = []
+        complete = False
+
+        def apply(record):
+            nonlocal complete
+            oid, type_name, action, value = record
+            if action == 'end':
+                complete = True
+                return
+            obj = taint_registry.lookup(oid)
+            if obj is None or type(obj).__name__ != type_name or not owned_by(obj.taints, self.mask):
+                # The object is gone, or its id has been reused by another object.
+                self.stats['stale'] += 1
+                return
+            if action == 'splice':
+                with obj.splice() as resource:
+                    self._count('system', obj)
+                self._erase(obj)
+            elif action == 'flag':
+                self._count('flagged', obj)
+                flag_obj(obj)
+                self._erase(obj)
+            else:
+                replacements.append((obj, SpliceMixin.to_splice(value, False, True, empty_taint(), [])))
+            self.processed += 1
+
+        # The pool's queue manager thread (and its locks) must not be running
+        # when the process forks. The parent does not need the pool while the
+        # child plans; it is started again on demand (see get_executor()).
+        shutdown_executor()
+        rfd, wfd = os.pipe()
+        # The child's snapshot starts a new registry epoch (see _verify()).
+        self.epoch = taint_registry.advance_epoch()
+        pid = os.fork()
+        if pid == 0:
+            os.close(rfd)
+            status = 1
+            try:
+                write_plan(self.sids, wfd, self.max_workers)
+                status = 0
+            finally:
+                os._exit(status)
+        os.close(wfd)
+        try:
+            await self._read_records(rfd, apply)
+        except BaseException:
+            # E.g., the job is cancelled: the child's plan is of no use anymore.
+            os.kill(pid, signal.SIGKILL)
+            raise
+        finally:
+            await self._reap(pid)
+        self._slice_start = time.perf_counter()
+        if not complete:
+            # The child died before the plan was complete: plan the rest here.
+            self.logging.warning("[splice] Deletion planning of user {} failed in the child process"
+                                 .format(self.users))
+            replacements.extend(await self._plan(skip={id(obj) for obj, _ in replacements}))
+        return replacements
+
+    @staticmethod
+    async def _reap(pid):
+        """Wait for the child process pid to exit, polling so as not to block the event loop."""
+        delay = 0.001
+        while True:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return  # Already reaped (e.g., by a child watcher).
+            if done:
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    async def _read_records(self, fd, on_record):
+        """Call on_record() with every record read from the pipe fd until the writer closes it."""
+        loop = asyncio.get_event_loop()
+        done = loop.create_future()
+        buf = bytearray()
+
+        def readable():
+            try:
+                chunk = os.read(fd, 1 << 16)
+            except (BlockingIOError, InterruptedError):
+                return
+            if not chunk:
+                loop.remove_reader(fd)
+                done.set_result(None)
+                return
+            buf.extend(chunk)
+            start = 0
+            while len(buf) - start >= _RECORD_SIZE.size:
+                (size,) = _RECORD_SIZE.unpack_from(buf, start)
+                end = start + _RECORD_SIZE.size + size
+                if len(buf) < end:
+                    break
+                on_record(pickle.loads(buf[start + _RECORD_SIZE.size:end]))
+                start = end
+            del buf[:start]
+
+        os.set_blocking(fd, False)
+        loop.add_reader(fd, readable)
+        try:
+            await done
+        finally:
+            if not done.done():
+                loop.remove_reader(fd)
+            os.close(fd)
+
+    async def _replace(self, replacements):
+        """Replace every original object with its synthesized object and flag the original."""
+        # Find the references to all original objects and redirect them in
+        # slices. Since the heap may change between slices, a reference that
+        # no longer refers to its original object is skipped. The original
+        # objects are flagged once their references are redirected, so a
+        # reference that could not be redirected (e.g., from a tuple) never
+        # reaches user data.
+        self._enter('search', len(replacements))
+        # The job's own references to the original objects are not redirected.
+        bookkeeping = (replacements, self._erased)
+        if replace.get_backend() == 'gc' and len(replacements) > replace.SCAN_THRESHOLD:
+            # A large batch (e.g., of several users) is searched with one pass
+            # over the heap, in slices (see replace.referrers_in()). Only ids
+            # are kept, so that the search does not find itself.
+            ids = {id(obj) for obj, _ in replacements}
+            heap = gc.get_objects()
+            self.total = len(heap)
+            referrers = []
+            for start in range(0, len(heap), self.SCAN_CHUNK):
+                referrers.extend(replace.referrers_in(ids, heap[start:start + self.SCAN_CHUNK]))
+                self.processed = min(start + self.SCAN_CHUNK, len(heap))
+                if self._out_of_time():
+                    await self._next_slice()
+            del heap, ids
+            plan = replace.plan_replacement(replacements, referrers, bookkeeping)
+            del referrers
+        elif replace.get_backend() == 'gc':
+            # Each gc.get_referrers() call traverses all tracked objects and
+            # compares every reference with each object it looks for, so the
+            # search can be split in chunks: a chunk grows as long as its cost
+            # stays within a slice or is still dominated by the traversal
+            # (i.e., within twice the cost of searching for a single object).
+            plan = []
+            chunk, start, base = 1, 0, None
+            while start < len(replacements):
+                timer = time.perf_counter()
+                plan.extend(replace.plan_replacement(replacements[start:start + chunk], exclude=bookkeeping))
+                elapsed = time.perf_counter() - timer
+                if base is None:
+                    base = elapsed
+                start += chunk
+                self.processed = start
+                if elapsed < max(self.slice_time, 2 * base) / 2:
+                    chunk *= 2
+                elif elapsed > max(self.slice_time, 4 * base) and chunk > 1:
+                    chunk //= 2
+                if self._out_of_time():
+                    await self._next_slice()
+            plan.sort(key=replace.plan_key)
+        else:
+            # A guppy traversal walks the entire heap however many objects it
+            # looks for, so the search is done in one go (the only step of the
+            # job that is not time-sliced).
+            plan = replace.plan_replacement(replacements, exclude=bookkeeping) if replacements else []
+            self.processed = len(replacements)
+        if self.audit:
+            self._erased.extend(obj for obj, _ in replacements)
+            self._references = [reference for reference, _ in plan]
+        await self._next_slice()
+        failed = set()
+
+        def redirect(reference_and_new):
+            reference, new = reference_and_new
+            try:
+                replace.redirect(reference, new)
+            except Exception:
+                # Replacement should not fail, but just in case it fails, we want to know.
+                print("**** replacing {} failed ****".format(reference.target))
+                failed.add(id(reference.target))
+
+        def finish(obj):
+            if id(obj) not in failed:
+                self._count('synthesized', obj)
+            flag_obj(obj)
+
+        self._enter('replace', len(plan))
+        await self._run_sliced(plan, redirect)
+        del plan
+        await self._run_sliced((obj for obj, _ in replacements), finish)
+        await self._next_slice()
+
+    async def _verify(self):
+        """Delete or flag the objects that are still tainted by the user."""
+        # Objects the user's connection created (or retainted) while the job ran
+        # are still tainted. Every object of the snapshot has been deleted, so
+        # only the objects tainted since the snapshot's epoch are visited.
+        leftovers = [obj for obj in taint_registry.young_objects(self.mask) if owned_by(obj.taints, self.mask)]
+
+        def verify(obj):
+            if not owned_by(obj.taints, self.mask):
+                return
+            self._count('leftover', obj)
+            if isinstance(obj, SpliceAttrMixin):
+                with obj.splice() as resource:
+                    self._count('system', obj)
+            else:
+                self._count('flagged', obj)
+                flag_obj(obj)
+            self._erase(obj)
+
+        self._enter('verify', len(leftovers))
+        await self._run_sliced(leftovers, verify)
+
+    def _count(self, kind, obj):
+        """Count obj, which is about to be deleted (while it still has its taints), as kind."""
+        self.stats[kind] += 1
+        counts = self.per_user.get(obj.taints)
+        if counts is not None:
+            counts[kind] += 1
+            return
+        for taint, counts in self.per_user.items():
+            if obj.taints & taint:
+                counts[kind] += 1
+
+    def _erase(self, obj):
+        """Remember obj, which the job has just deleted (or flagged), for the audit."""
+        if self.audit:
+            self._erased.append(obj)
+
+    async def _audit(self):
+        """
+        Check that the deletion left nothing behind, without walking the heap. Only
+        what the deletion touched is visited: every object it deleted must no longer
+        carry the user's taint, every container that referred to an original object
+        (found by the search phase) must no longer refer to it, and no object may
+        have been tainted by the user since the verify pass. Anything found is added
+        to survivors (and logged); stats report the number of survivors and the
+        time the audit took.
+        """
+        start = time.perf_counter()
+        survivors = self.survivors
+
+        def check_erased(obj):
+            if owned_by(obj.taints, self.mask):
+                survivors.append(('object', type(obj).__name__, id(obj)))
+
+        def check_reference(reference):
+            if replace.refers(reference):
+                # Only the kind of reference is reported: an index or key may be user data.
+                survivors.append(('reference', type(reference.source).__name__, reference.kind))
+
+        def check_young(obj):
+            if owned_by(obj.taints, self.mask):
+                survivors.append(('young', type(obj).__name__, id(obj)))
+
+        young = taint_registry.young_objects(self.mask)
+        self._enter('audit', len(self._erased) + len(self._references) + len(young))
+        await self._run_sliced(self._erased, check_erased)
+        await self._run_sliced(self._references, check_reference)
+        await self._run_sliced(young, check_young)
+        checked = self.processed
+        self._erased, self._references = [], []
+        del young
+        self.stats['survivors'] = len(survivors)
+        self.stats['audit_time'] = time.perf_counter() - start
+        self.logging.info("[splice] Deletion of user {}: audit checked {} objects and references in {:.2f}ms, "
+                          "{} survivors".format(self.users, checked, self.stats['audit_time'] * 1000,
+                                                len(survivors)))
+        for kind, type_name, detail in survivors[:10]:
+            self.logging.warning("[splice] Deletion of user {}: {} ({}, {}) still holds the user's data"
+                                 .format(self.users, kind, type_name, detail))
+
+
+async def delete_user(sid, logging, max_workers=None, on_progress=None, fork=False, audit=False):
+    """
+    Delete all objects tainted by (and only by) the user with taint sid (or by the
+    users, if sid is a collection of taints) without blocking the event
+    loop (see DeletionJob). System objects are deleted by their
+    splice() context managers. Other objects are synthesized in worker processes
+    (or, if a job cannot be sent to a worker, e.g., because its constraints cannot
+    be pickled, on the event loop thread) and replaced. Return a dict of the number
+    of system objects deleted, objects synthesized, objects flagged, and objects
+    left over for the final consistency pass. If fork is True, the deletion is
+    planned by a forked child (see DeletionJob). If audit is True, the dict also
+    has the number of survivors found by the audit and the audit's time.
+    """
+    return await DeletionJob(sid, logging, max_workers, on_progress=on_progress, fork=fork, audit=audit).run()
+
+
+async def delete_users(sids, logging, max_workers=None, on_progress=None, fork=False, audit=False):
+    """
+    Delete the users with taints in sids in one batch (see delete_user()): their
+    objects are discovered, synthesized and replaced together, which costs far
+    less than deleting them one at a time. Return the dict of delete_user() and
+    a dict that maps each taint to the same counts for that user alone.
+    """
+    job = DeletionJob(sids, logging, max_workers, on_progress=on_progress, fork=fork, audit=audit)
+    stats = await job.run()
+    return stats, job.per_user
@@ -48,10 +48,11 @@ class PPPDProtocol(asyncio.SubprocessProtocol):
         # TODO: data received will be untrusted. Defensive programming must
         #  be applied here and set the data to be trusted afterwards.
         if __splice__:
-            assert not data.trusted
+            region = self.transport.get_pipe_transport(fd).get_extra_info('taint_region')
+            assert region is None or not region.trusted
             # FIXME: DP code here if needed
-            # After DP, data should be trusted.
-            data.trusted = True
+            # After DP, data should be trusted. Frames are passed on to the
+            # SSTP transport right away, so they are never materialized.
         # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
         if fd == STDOUT:
             self.out_received(data)
@@ -1,13 +1,29 @@
 import ctypes
 from ctypes import pythonapi as api
+import gc
 import sys
-from types import (BuiltinFunctionType, GetSetDescriptorType,
-                   MemberDescriptorType, MethodType)
-
-import guppy
-from guppy.heapy import Path
-
-hp = guppy.hpy()
+from collections import namedtuple
+from types import (BuiltinFunctionType, FrameType, GetSetDescriptorType,
+                   MemberDescriptorType, MethodType, ModuleType)
+
+# Backends that find the references to the objects to be replaced:
+# 'guppy' follows hp.iso().pathsin, which walks the entire heap; 'gc'
+# asks gc.get_referrers() and only inspects the containers that can
+# hold Splice objects (lists, dicts, sets, instance __dict__s, cells
+# and frames). See set_backend().
+BACKENDS = ('guppy', 'gc')
+_backend = 'guppy'
+
+# gc.get_referrers() compares every reference in the heap with each of the
+# objects it looks for, so its cost grows with their number. The 'gc' backend
+# looks for more objects than this with one pass over gc.get_objects() instead
+# (see referrers_in()), which costs the same however many objects it looks for.
+SCAN_THRESHOLD = 32
+
+# guppy is imported on first use, so that the 'gc' backend
+# pays neither its import cost nor its memory overhead.
+_hp = None
+_guppy_relations = None
 
 
 def _w(x):
@@ -31,7 +47,7 @@ def _write_struct_attr(addr, value, add_offset):
         ctypes.memmove(addr + offset, ref, ptr_size)
 
 
-def _replace_attribute(source, rel, new):
+def _replace_attribute(source, rel, new, old):
     if isinstance(source, (MethodType, BuiltinFunctionType)):
         if rel == "__self__":
             # Note: PyMethodObject->im_self and PyCFunctionObject->m_self
@@ -55,7 +71,7 @@ def _replace_attribute(source, rel, new):
         print("Unknown R_ATTRIBUTE (read-only): {} ({})".format(rel, type(source)))
 
 
-def _replace_indexval(source, rel, new):
+def _replace_indexval(source, rel, new, old):
     if isinstance(source, tuple):
         # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
         # FIXME: Unfortunately, replacing tuple objects lead to errors difficult to
@@ -70,16 +86,26 @@ def _replace_indexval(source, rel, new):
     source[rel] = new
 
 
-def _replace_indexkey(source, rel, new):
+def _replace_indexkey(source, rel, new, old):
+    if isinstance(source, set):
+        source.discard(old)
+        source.add(new)
+        return
     # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
     # 'dict_keys' object is not subscriptable in Python
     # 3, so we convert it into a list first.
     # source[new] = source.pop(source.keys()[rel])
-    source[new] = source.pop(list(source.keys())[rel])
+    # source[new] = source.pop(list(source.keys())[rel])
+    # The key is looked up by the object itself, not by
+    # its position rel: re-inserting a replaced key moves
+    # it to the end of the dict, so positions computed in
+    # the same heap traversal are stale once another key
+    # of the same dict has been replaced.
+    source[new] = source.pop(old)
     # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
 
 
-def _replace_interattr(source, rel, new):
+def _replace_interattr(source, rel, new, old):
     if isinstance(source, CellType):
         api.PyCell_Set(ctypes.py_object(source), ctypes.py_object(new))
         return
@@ -89,23 +115,172 @@ def _replace_interattr(source, rel, new):
     print("Unknown R_INTERATTR: {} ({})".format(rel, type(source)))
 
 
-def _replace_local_var(source, rel, new):
+def _replace_local_var(source, rel, new, old):
     source.f_locals[rel] = new
     api.PyFrame_LocalsToFast(ctypes.py_object(source), ctypes.c_int(0))
 
 
+# Relation kinds of a reference to an object (the same kinds as guppy's Path.R_*)
+R_ATTRIBUTE = 'attribute'
+R_INDEXVAL = 'indexval'
+R_INDEXKEY = 'indexkey'
+R_INTERATTR = 'interattr'
+R_LOCAL_VAR = 'local_var'
+
 _RELATIONS = {
-    Path.R_ATTRIBUTE: _replace_attribute,
-    Path.R_INDEXVAL: _replace_indexval,
-    Path.R_INDEXKEY: _replace_indexkey,
-    Path.R_INTERATTR: _replace_interattr,
-    Path.R_LOCAL_VAR: _replace_local_var
+    R_ATTRIBUTE: _replace_attribute,
+    R_INDEXVAL: _replace_indexval,
+    R_INDEXKEY: _replace_indexkey,
+    R_INTERATTR: _replace_interattr,
+    R_LOCAL_VAR: _replace_local_var
 }
 
+# A reference from source to target through relation rel of the given kind
+# (e.g., kind R_INDEXVAL and rel 3 if target is source[3]).
+Reference = namedtuple('Reference', ['kind', 'source', 'rel', 'target'])
+
+
+def _path_key_func(reference):
+    return 1 if reference.kind is R_ATTRIBUTE else 0
+
+
+def _hpy():
+    """Return guppy's heapy session, importing guppy on first use."""
+    global _hp, _guppy_relations
+    if _hp is None:
+        import guppy
+        from guppy.heapy import Path
+        _hp = guppy.hpy()
+        _guppy_relations = {
+            Path.R_ATTRIBUTE: R_ATTRIBUTE,
+            Path.R_INDEXVAL: R_INDEXVAL,
+            Path.R_INDEXKEY: R_INDEXKEY,
+            # Set members are replaced like dict keys (see _replace_indexkey()).
+            Path.R_INSET: R_INDEXKEY,
+            Path.R_INTERATTR: R_INTERATTR,
+            Path.R_LOCAL_VAR: R_LOCAL_VAR
+        }
+    return _hp
+
+
+def set_backend(backend):
+    """Select how references to the objects to be replaced are found ('guppy' or 'gc')."""
+    global _backend
+    if backend not in BACKENDS:
+        raise ValueError("Unknown replacement backend: {} (expected one of {})".format(backend, BACKENDS))
+    _backend = backend
+
+
+def get_backend():
+    return _backend
+
+
+def _skipped(exclude=()):
+    """
+    Return the ids of the containers whose references are not replaced: the
+    containers in exclude (e.g., the caller's bookkeeping) and the frames on
+    the current call stack, whose locals belong to the code that is doing the
+    replacement.
+    """
+    skip = {id(container) for container in exclude}
+    frame = sys._getframe(1)
+    while frame is not None:
+        skip.add(id(frame))
+        frame = frame.f_back
+    return skip
+
+
+def _guppy_references(objs, exclude=()):
+    """
+    Return the references to objs, found by a guppy traversal of the entire heap.
+    As with the 'gc' backend, references from tuples (which cannot be replaced,
+    see _replace_indexval()) and from the containers that _skipped() returns are
+    left out.
+    """
+    skip = _skipped(exclude)
+    references = []
+    for path in _hpy().iso(*objs).pathsin:
+        source = path.src.theone
+        if isinstance(source, tuple) or id(source) in skip:
+            continue
+        relation = path.path[1]
+        kind = _guppy_relations.get(type(relation).__bases__[0])
+        if kind is None:
+            print("Unknown relation: {} ({})".format(relation, type(path.src.theone)))
+            continue
+        references.append(Reference(kind, source, relation.r, path.path[2].theone))
+    return references
+
+
+def referrers_in(ids, objects):
+    """Return the objects in objects (e.g., a slice of gc.get_objects()) that refer to an object whose id is in ids."""
+    return [obj for obj in objects if not ids.isdisjoint(map(id, gc.get_referents(obj)))]
 
-def _path_key_func(path):
-    reltype = type(path.path[1]).__bases__[0]
-    return 1 if reltype is Path.R_ATTRIBUTE else 0
+
+def _gc_references(objs, referrers=None, exclude=()):
+    """
+    Return the references to objs, found by gc.get_referrers() (or, for more than
+    SCAN_THRESHOLD objects, one pass over the heap), or in referrers, if the
+    objects that refer to objs are already known (see referrers_in()). Only lists,
+    dicts (including instance __dict__s), sets, cells, frames and instances
+    (whose attributes live in the instance itself) are inspected; tuples are
+    skipped, since they cannot be replaced anyway (see _replace_indexval()),
+    and so are the containers that _skipped() returns.
+    """
+    targets = {id(obj): obj for obj in objs}
+    skip = _skipped(exclude)
+    skip.update((id(targets), id(objs)))
+    if referrers is None:
+        if len(objs) > SCAN_THRESHOLD:
+            referrers = referrers_in(targets.keys(), gc.get_objects())
+        else:
+            referrers = gc.get_referrers(*objs)
+    references = []
+    for referrer in referrers:
+        if id(referrer) in skip:
+            continue
+        if isinstance(referrer, list):
+            for i, item in enumerate(referrer):
+                if id(item) in targets:
+                    references.append(Reference(R_INDEXVAL, referrer, i, item))
+        elif isinstance(referrer, dict):
+            for key, value in referrer.items():
+                if id(key) in targets:
+                    references.append(Reference(R_INDEXKEY, referrer, key, key))
+                if id(value) in targets:
+                    references.append(Reference(R_INDEXVAL, referrer, key, value))
+        elif isinstance(referrer, set):
+            for item in referrer:
+                if id(item) in targets:
+                    references.append(Reference(R_INDEXKEY, referrer, None, item))
+        elif isinstance(referrer, CellType):
+            try:
+                contents = referrer.cell_contents
+            except ValueError:  # empty cell
+                continue
+            if id(contents) in targets:
+                references.append(Reference(R_INTERATTR, referrer, 'cell_contents', contents))
+        elif isinstance(referrer, FrameType):
+            for name, value in referrer.f_locals.items():
+                if id(value) in targets:
+                    references.append(Reference(R_LOCAL_VAR, referrer, name, value))
+        elif not isinstance(referrer, (tuple, type, ModuleType)) and hasattr(referrer, '__dict__'):
+            # Instances whose __dict__ has not been materialized refer to their attributes directly.
+            for name, value in vars(referrer).items():
+                if id(value) in targets:
+                    references.append(Reference(R_ATTRIBUTE, referrer, name, value))
+    return references
+
+
+def get_references(objs, referrers=None, exclude=()):
+    """
+    Return the references to objs, found by the selected backend (see set_backend()),
+    except those from the containers in exclude. With the 'gc' backend, referrers,
+    if given, are the objects that refer to objs.
+    """
+    if _backend == 'gc':
+        return _gc_references(objs, referrers, exclude)
+    return _guppy_references(objs, exclude)
 
 
 def get_objects():
@@ -113,7 +288,7 @@ def get_objects():
     Get all live objects in the heap using guppy.
     This is the same as GC's get_objects().
     """
-    return hp.heap().nodes
+    return _hpy().heap().nodes
 
 
 def set_heap_start_point():
@@ -129,55 +304,148 @@ def set_heap_start_point():
     objects from the loaded files (instead of the
     entire heap again). See pickle.py and lsm.py for context.
     """
-    hp.setrelheap()
+    _hpy().setrelheap()
 
 
 def get_path_map(objs):
     """
-    Return a dict that maps an object ID to all the paths that refer the object.
+    Return a dict that maps an object ID to all the references (paths) to the object.
     We should have an entry for each object in "objs".
     """
     d = dict()
-    paths = hp.iso(*objs).pathsin
-    for path in paths:
-        obj_id = id(path.path[2].theone)
+    for reference in get_references(objs):
+        obj_id = id(reference.target)
         if obj_id not in d:
-            d[obj_id] = [path]
+            d[obj_id] = [reference]
         else:
-            d[obj_id].append(path)
+            d[obj_id].append(reference)
     return d
 
 
+def _redirect(reference, new):
+    """Redirect a single reference to point to new."""
+    _RELATIONS[reference.kind](reference.source, reference.rel, new, reference.target)
+
+
+class _KeyProbe(object):
+    """
+    Stands in for target in a dict or set lookup: it hashes like target and
+    only equals target itself, so the lookup finds target's own entry (and
+    not merely an equal key) without iterating over the container.
+    """
+    __slots__ = ('target', 'hash')
+
+    def __init__(self, target):
+        self.target = target
+        self.hash = hash(target)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return other is self.target
+
+
+def _holds_key(source, target):
+    """Return True if target itself is a key of the dict or a member of the set source."""
+    if target not in source:
+        return False
+    if _KeyProbe(target) in source:
+        return True
+    # An equal key that is not target, or a key whose __eq__ does not
+    # return NotImplemented for the probe (so the probe is never asked).
+    return any(key is target for key in source)
+
+
+def refers(reference):
+    """Return True if reference (found earlier) still refers to its target."""
+    source, rel, target = reference.source, reference.rel, reference.target
+    try:
+        if reference.kind is R_ATTRIBUTE:
+            return getattr(source, rel) is target
+        if reference.kind is R_INDEXVAL:
+            return source[rel] is target
+        if reference.kind is R_INDEXKEY:
+            return _holds_key(source, target)
+        if reference.kind is R_INTERATTR:
+            if isinstance(source, CellType):
+                return source.cell_contents is target
+            return type(source) is target
+        if reference.kind is R_LOCAL_VAR:
+            return source.f_locals.get(rel) is target
+    except Exception:
+        pass
+    return False
+
+
+def plan_key(redirection):
+    """Sort key of a (reference, new) redirection, so that plans are redirected in _path_key_func order."""
+    return _path_key_func(redirection[0])
+
+
+def plan_replacement(pairs, referrers=None, exclude=()):
+    """
+    Return the (reference, new) redirections that replace every old object with
+    its new object for all (old, new) in pairs, in the order _path_key_func
+    defines. A single search finds the references to all old objects (see
+    get_references() for referrers and exclude). pairs itself is excluded.
+    """
+    new_objs = {id(old): new for old, new in pairs}
+    references = get_references([old for old, _ in pairs], referrers, (pairs,) + tuple(exclude))
+    return sorted(((reference, new_objs[id(reference.target)]) for reference in references), key=plan_key)
+
+
+def redirect(reference, new):
+    """
+    Redirect a reference from plan_replacement() to new, if it still refers to
+    its target (the heap may have changed since the reference was found).
+    Return True if the reference was redirected.
+    """
+    if not refers(reference):
+        return False
+    _redirect(reference, new)
+    return True
+
+
 def replace(new, paths):
     """
     Replace all paths to point to new.
-    Path should be the output of hp.iso().pathsin.
+    Paths should be references from get_path_map().
     """
     for path in sorted(paths, key=_path_key_func):
-        relation = path.path[1]
+        _redirect(path, new)
+
+
+def replace_many(pairs):
+    """
+    Replace every old object with its new object for all (old, new) in pairs.
+    A single search (a heap traversal with guppy) finds the references to all
+    old objects and all references are then redirected in one pass, in the
+    order _path_key_func defines. Return the IDs of old objects for which a
+    redirection failed.
+    """
+    if not pairs:
+        return set()
+    failed = set()
+    for reference, new in plan_replacement(pairs):
         try:
-            func = _RELATIONS[type(relation).__bases__[0]]
-        except KeyError:
-            print("Unknown relation: {} ({})".format(relation, type(path.src.theone)))
-            continue
-        func(path.src.theone, relation.r, new)
+            _redirect(reference, new)
+        except Exception:
+            # Replacement should not fail, but just in case it fails, we want to know.
+            print("**** replacing {} failed ****".format(reference.target))
+            failed.add(id(reference.target))
+    return failed
 
 # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
 # This is a different implementation where each 'old' object is replaced by the 'new'
 # object. It will call hp.iso().pathsin every time an object needs to be replaced, which
 # results in many scans of the heap if we want to replace a number of objects (i.e.,
 # calling this function in a loop), which incurs lots of overhead. We therefore use
-# get_path_map() and replace() instead to minimize heap walks.
+# replace_many() (or get_path_map() and replace()) instead to minimize heap walks.
 # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
 def replace_single(old, new):
-    for path in sorted(hp.iso(old).pathsin, key=_path_key_func):
-        relation = path.path[1]
-        try:
-            func = _RELATIONS[type(relation).__bases__[0]]
-        except KeyError:
-            print("Unknown relation: {} ({})".format(relation, type(path.src.theone)))
-            continue
-        func(path.src.theone, relation.r, new)
+    for reference in sorted(get_references([old]), key=_path_key_func):
+        _redirect(reference, new)
 
 
 if __name__ == "__main__":
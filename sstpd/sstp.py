@@ -10,7 +10,6 @@ import subprocess
 import tempfile
 import hmac
 import hashlib
-import time
 
 from . import __version__
 from .constants import *
@@ -20,16 +19,12 @@ from .ppp import PPPDProtocol, PPPDProtocolFactory, is_ppp_control_frame, PPPDSS
 from .proxy_protocol import parse_pp_header, PPException, PPNoEnoughData
 
 # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-import replace
-import gc
-from .constraints import merge_constraints
-from .synthesis import init_synthesizer_on_type
 # Splice package is added to Python3.6/asyncio/. We will
 # use asyncio.splice module when __splice__ is set to True
 from asyncio.splice import __splice__
 if __splice__:
-    from asyncio.splice.splice import SpliceAttrMixin, SpliceMixin
-    from asyncio.splice.identity import taint_id_from_addr, empty_taint
+    from asyncio.splice.identity import taint_id_from_addr, release_taint_from_addr
+    from asyncio.splice.splice import SpliceMixin
 # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
 
 HTTP_REQUEST_BUFFER_SIZE = 10 * 1024
@@ -39,82 +34,6 @@ def parse_length(s):
     return ((s[0] & 0x0f) << 8) + s[1]  # Ignore R
 
 
-# !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-def concretize_and_merge_constraints(obj, unsplicify=True):
-    """
-    Return a set of concrete constraints for a Splice object.
-    For multiprocess to work, objects within the constraints
-    must be unsplicified. However, when building dependency
-    graph, objects need to keep their actual types. Therefore,
-    we make unsplificy an option in the argument.
-    """
-    # Concretize constraints for obj using symbolic
-    # constraints from its enclosing data structure.
-    concrete_constraints = []
-    # Each constraint in obj.constraints is a callable that takes
-    # the object as the only argument. Each callback function
-    # returns concrete constraints in disjunctive normal form.
-    for constraint in obj.constraints:
-        # NOTE: not unsplicify is a boolean which is used to signify
-        # that we are building constraints to create dependency graph
-        # (since we do not unsplicify when we build the graph).
-        obj_constraints = constraint(obj, not unsplicify)
-        if unsplicify:
-            # Unsplificy all Splice objects that are part of the constraint
-            for obj_constraint in obj_constraints:
-                for k, conditions in obj_constraint.items():
-                    new_conditions = []
-                    for condition in conditions:
-                        if isinstance(condition, SpliceMixin):
-                            new_conditions.append(condition.unsplicify())
-                        else:
-                            new_conditions.append(condition)
-                    obj_constraint[k] = new_conditions
-            concrete_constraints.append(obj_constraints)
-        else:
-            concrete_constraints.append(obj_constraints)
-    # Merge all concrete constraints, if needed
-    if not concrete_constraints:
-        merged_constraints = None
-    else:
-        merged_constraints = concrete_constraints[0]
-        for concrete_constraint in concrete_constraints[1:]:
-            merged_constraints = merge_constraints(merged_constraints, concrete_constraint)
-    return merged_constraints
-
-
-def synthesize_obj(obj_type, constraints):
-    """
-    Synthesize a new object based on its constraints.
-    It is possible that synthesis does not succeed because
-    for example constraints have conflicts. In such a case,
-    None is returned.
-    """
-    if constraints is not None:
-        synthesizer = init_synthesizer_on_type(obj_type)
-        # start_time = time.perf_counter()
-        synthesized_obj = synthesizer.splice_synthesis(constraints)
-        # logger.info("Synthesizing one object takes: {}".format(time.perf_counter() - start_time))
-        return synthesized_obj
-    return None
-
-
-def replace_obj(obj, references):
-    """Redirect all references to obj. If redirection succeeds, return True; otherwise, False."""
-    # Perform object replacement for objects that have a synthesized version
-    # We use guppy. Note that using ctypes.memmove does not seem to work (leads to segfault).
-    # ctypes.memmove(id(obj), id(synthesized_obj), object.__sizeof__(obj))
-    # ctypes.memmove ref: https://docs.python.org/2/library/ctypes.html#ctypes.memmove
-    try:
-        replace.replace(obj, references)
-        return True
-    except:
-        # Replacement should not fail, but just in case it fails, we want to know.
-        print("**** replacing {} failed ****".format(obj))
-    return False
-# =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
-
-
 class State(Enum):
     SERVER_CALL_DISCONNECTED = 'Server_Call_Disconnected'
     SERVER_CONNECT_REQUEST_PENDING = 'Server_Connect_Request_Pending'
@@ -146,6 +65,9 @@ class SSTPProtocol(Protocol):
         self.correlation_id = None
         self.remote_host = None
         self.remote_port = None
+        self.peer = None
+        # Taint record of all data received from the client (splice only)
+        self.taint_region = None
         # PPP SSTP API
         self.ppp_sstp = None
         # High(er) LAyer Key (HLAK)
@@ -163,7 +85,14 @@ class SSTPProtocol(Protocol):
     def connection_made(self, transport):
         self.transport = transport
         self.proxy_protocol_passed = not self.factory.proxy_protocol
+        # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+        # Data received from the transport are plain bytes; their taints
+        # are kept once for the whole connection in the taint region.
+        if __splice__:
+            self.taint_region = transport.get_extra_info('taint_region')
+        # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
         peer = self.transport.get_extra_info("peername")
+        self.peer = peer
         if hasattr(peer, 'host'):
             self.remote_host = str(peer.host)
             self.remote_port = int(peer.port) if hasattr(peer, 'port') else None
@@ -175,57 +104,15 @@ class SSTPProtocol(Protocol):
 
     def data_received(self, data):
         # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
-        # Check if it is a SPLICE command, but only if __splice__ is set
         # TODO: data received will be untrusted. Defensive programming must
         #  be applied here and set the data to be trusted afterwards.
         if __splice__:
-            assert not data.trusted
-            # FIXME: DP code here if needed
-            # After DP, data should be trusted.
-            data.trusted = True
-            if data.startswith(b'SPLICE'):
-                # SPLICE command is simple: SPLICE:<TAINT ID>
-                # Get the taint of the user (int) to be spliced
-                sid = int(data.decode("utf-8").strip().split(':')[1])
-                # Splice deletion code
-                system_obj_synthesized, obj_synthesized, obj_flagged = 0, 0, 0
-                start_timer = time.perf_counter()
-                objs = gc.get_objects()
-                self.logging.info("[splice] Getting all {} heap objects takes: {}s"
-                                  .format(len(objs), time.perf_counter() - start_timer))
-                self.logging.info("[splice] Splice deletion begins...")
-                for obj in objs:
-                    # Identify all splice-able objects
-                    if hasattr(obj, 'taints') and obj.taints == sid:
-                        # print("[splice] splicing object: {} "
-                        #       "(type: {}, taints: {})".format(obj, type(obj), obj.taints))
-                        try:
-                            start_timer = time.perf_counter()
-                            with obj.splice() as resource:
-                                # splice() will handle deletion automatically.
-                                # Developers can put more code here for defensive
-                                # programming afterwards if necessary.
-                                self.logging.info("[splice] Taking {}s to delete system object: {}".format(time.perf_counter() - start_timer, obj))
-                                system_obj_synthesized += 1
-                        except:
-                            # Synthesize non-system-resource objects one at a time
-                            start_timer = time.perf_counter()
-                            merged_constraints = concretize_and_merge_constraints(obj, unsplicify=False)
-                            synthesized_obj = synthesize_obj(type(obj), merged_constraints)
-                            # No synthesized object is produced, so the best we can do is to change object attributes.
-                            if synthesized_obj is None:
-                                obj.trusted = False
-                                obj.synthesized = True
-                                obj.taints = empty_taint()
-                                obj.constraints = []
-                                obj_flagged += 1
-                            else:
-                                replace.replace_single(obj, synthesized_obj)
-                                obj_synthesized += 1
-                            self.logging.info("[splice] Taking {}s to delete non-system object: {}".format(time.perf_counter() - start_timer, obj))
-                # Respond to the client when Splice deletion is finished
-                self.transport.write(b'Splice: user %s is erased\r\n' % str(sid).encode())
-                return
+            assert self.taint_region is None or not self.taint_region.trusted
+        # FIXME: DP code here if needed
+        # After DP, data should be trusted. Data stays plain bytes within
+        # the connection; it is tainted (and trusted) by materialize()
+        # only when it is stored beyond data_received(). Deletion requests
+        # are not accepted in-band: they go to the admin socket (admin.py).
         # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
         if self.state == State.SERVER_CALL_DISCONNECTED:
             if self.proxy_protocol_passed:
@@ -251,7 +138,30 @@ class SSTPProtocol(Protocol):
                 self.logging.info('Unregistered address %s', self.pppd.remote);
         self.hello_timer.cancel()
         self.ppp_sstp_api_close()
-
+        # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+        # Taint bits are allocated per client address when the connection is
+        # accepted (and again if the remote address is changed by a proxy),
+        # so release them here to be recycled for future connections.
+        if __splice__:
+            if type(self.peer) == tuple:
+                release_taint_from_addr(self.peer)
+            if self.remote_host is not None and self.remote_port is not None:
+                release_taint_from_addr((self.remote_host, self.remote_port))
+        # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=
+
+
+    # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+    def materialize(self, value):
+        """
+        Taint value derived from the client's data with the connection's taint
+        region before it is stored in a long-lived structure. value must have
+        gone through DP, so it is trusted, unless the region has been spliced
+        (its data is then synthesized). No-op if __splice__ is not set.
+        """
+        if __splice__ and self.taint_region is not None and value is not None:
+            return self.taint_region.materialize(value, trusted=not self.taint_region.synthesized)
+        return value
+    # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
 
     def proxy_protocol_data_received(self, data):
         self.receive_buf.extend(data)
@@ -294,7 +204,7 @@ class SSTPProtocol(Protocol):
         for header in filter(lambda x: b'sstpcorrelationid:' in x.lower(), headers):
             try:
                 guid = header.decode('ascii').split(':')[1]
-                self.correlation_id = guid.strip().strip("{}")
+                self.correlation_id = self.materialize(guid.strip().strip("{}"))
             except:
                 pass
         host, port = None, None
@@ -311,9 +221,9 @@ class SSTPProtocol(Protocol):
             except:
                 pass
         if self.factory.use_http_proxy and host is not None:
-            self.remote_host = host
+            self.remote_host = self.materialize(host)
             # port can be None if not forwarded
-            self.remote_port = port
+            self.remote_port = self.materialize(port)
         self.init_logging()
         self.transport.write(b'HTTP/1.1 200 OK\r\n'
                 b'Content-Length: 18446744073709551615\r\n'
@@ -588,7 +498,11 @@ class SSTPProtocol(Protocol):
         if self.hlak is None:
             self.logging.warning("Waiting for the Higher Layer Authentication "
                     "Key (HLAK) to verify Crypto Binding.")
-            self.client_cmac = mac_hash
+            # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+            # The CMAC outlives the packet, so it is tainted. mac_hash is a
+            # memoryview into the packet; it stays zero-copy as a SpliceMemoryView.
+            self.client_cmac = self.materialize(mac_hash)
+            # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
             return
 
         self.sstp_call_connected_crypto_binding(mac_hash)
@@ -601,6 +515,12 @@ class SSTPProtocol(Protocol):
             self.abort(ATTRIB_STATUS_INVALID_FRAME_RECEIVED)
             return
 
+        # !!!SPLICE =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
+        # A stored CMAC is a SpliceMemoryView, which does not export a buffer
+        # for hmac.compare_digest(); compare the memoryview it wraps instead.
+        if __splice__ and isinstance(mac_hash, SpliceMixin):
+            mac_hash = mac_hash.unsplicify()
+        # =+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+
         hash_type = (CERT_HASH_PROTOCOL_SHA1,
                 CERT_HASH_PROTOCOL_SHA256)[len(mac_hash) == 32]
 
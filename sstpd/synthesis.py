@@ -9,8 +9,11 @@ from z3 import Int, Real
 from z3 import BitVec
 from z3 import And, Or, If
 
+import time
+import math
 from datetime import datetime
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 
 from asyncio.splice import __splice__
 from asyncio.splice.splicetypes import SpliceMixin, SpliceInt, SpliceFloat, SpliceStr, SpliceDatetime, SpliceUserString
@@ -73,11 +76,178 @@ def dependencies_from_constraints(constraints_list, taint):
     return objs
 
 
+def _plain(value):
+    """Return value unsplicified if it is a Splice object."""
+    if isinstance(value, SpliceMixin):
+        return value.unsplicify()
+    return value
+
+
+def _canonical_value(value):
+    """
+    Return a hashable, plain (unsplicified) form of a constraint value.
+    The type is kept so that, e.g., 1 and 1.0 are never confused. Raise
+    TypeError if value cannot be hashed.
+    """
+    if isinstance(value, SpliceMixin):
+        value = value.unsplicify()
+    elif isinstance(value, tuple):
+        return tuple(_canonical_value(v) for v in value)
+    hash(value)
+    return type(value), value
+
+
+def canonical_constraints(constraints):
+    """
+    Return a canonical, hashable form of a dictionary of conjunctive
+    constraints, in which 'lt'/'le' and 'gt'/'ge' are consolidated to
+    their tightest bound as in Synthesizer._splice_synthesis(). Return
+    None if the constraints must not be cached: 'ne' constraints ask
+    for a value that differs from other values, so such synthesis is
+    never shared. Raise TypeError if a constraint cannot be hashed.
+    """
+    if not constraints:
+        return ()
+    if 'ne' in constraints:
+        return None
+    canonical = []
+    for op in sorted(constraints):
+        values = constraints[op]
+        if op in ('lt', 'le') and 'xeq' not in constraints:
+            canonical.append((op, _canonical_value(min(values))))
+        elif op in ('gt', 'ge') and 'xeq' not in constraints:
+            canonical.append((op, _canonical_value(max(values))))
+        else:
+            canonical.append((op, tuple(_canonical_value(v) for v in values)))
+    return tuple(canonical)
+
+
+class SynthesisCache(object):
+    """
+    An LRU cache of synthesis results keyed by a synthesizer's cache key
+    and the canonical form of a list of disjunctive constraints. Values are
+    stored unsplicified (so that the cache never keeps a Splice object alive)
+    and every hit returns a fresh synthesized Splice object. An unsuccessful
+    synthesis (None) is cached as well.
+    """
+    _MISSING = object()
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached plain value of key (possibly None), or SynthesisCache._MISSING."""
+        value = self._entries.get(key, self._MISSING)
+        if value is self._MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+synthesis_cache = SynthesisCache()
+
+# The number of (conjunctive) constraints solved in closed form
+# (without Z3) and the number of constraints given to Z3.
+synthesis_stats = {'closed_form': 0, 'solver': 0}
+
+
+def _within_bounds(value, upper_bound, lower_bound, include_upper, include_lower, excluded):
+    """Return True if value is within the (consolidated) bounds and differs from all excluded values."""
+    if upper_bound is not None:
+        if value > upper_bound or (value == upper_bound and not include_upper):
+            return False
+    if lower_bound is not None:
+        if value < lower_bound or (value == lower_bound and not include_lower):
+            return False
+    return value not in excluded
+
+
+def _is_finite_number(value):
+    """Return True if value is a finite int or float."""
+    if isinstance(value, int):
+        return True
+    return isinstance(value, float) and math.isfinite(value)
+
+
+class ScopedSolver(object):
+    """
+    A Z3 solver that remembers the result of check() and the model
+    until its constraints change, so that asking for satisfiability
+    and then for the model runs the SMT check only once. A push()
+    scope keeps the result of the enclosing scope, which is restored
+    by pop(), so that a solver can be reused for many syntheses.
+    """
+    def __init__(self):
+        self._solver = Solver()
+        self._result = None             # Cached check() result
+        self._model = None              # Cached model()
+        self._scopes = []               # Cached results of enclosing scopes
+        self.solve_time = 0.0           # Time (in seconds) of the last check() that reached Z3
+        self.total_solve_time = 0.0     # Time (in seconds) of all check() calls that reached Z3
+
+    def add(self, *constraints):
+        self._solver.add(*constraints)
+        self._result, self._model = None, None
+
+    def check(self):
+        if self._result is None:
+            start_time = time.perf_counter()
+            self._result = self._solver.check()
+            self.solve_time = time.perf_counter() - start_time
+            self.total_solve_time += self.solve_time
+        return self._result
+
+    def model(self):
+        if self._model is None:
+            self._model = self._solver.model()
+        return self._model
+
+    def push(self):
+        self._solver.push()
+        self._scopes.append((self._result, self._model))
+
+    def pop(self):
+        self._solver.pop()
+        self._result, self._model = self._scopes.pop()
+
+    def reset(self):
+        self._solver.reset()
+        self._result, self._model = None, None
+        self._scopes.clear()
+
+    def assertions(self):
+        return self._solver.assertions()
+
+
 class Synthesizer(ABC):
     """Synthesis base class."""
+    # Try closed_form_synthesis() before Z3 in splice_synthesis()
+    closed_form = True
+
     def __init__(self, symbol):
-        self.solver = Solver()
+        self.solver = ScopedSolver()
         self.var = symbol
+        # Time (in seconds) the solver spent in the last splice_synthesis() call
+        self.solve_time = 0.0
 
     def lt_constraint(self, values, **kwargs):
         """
@@ -242,11 +412,22 @@ class Synthesizer(ABC):
             raise ValueError("Two bounds must be specified. Perhaps use a different"
                              "synthesis method or simply call random()?")
         self.bounded_constraints(upper_bound, lower_bound, include_upper, include_lower, **kwargs)
-        if self.value is not None:
-            return self.to_python(self.value)
+        value = self.value
+        if value is not None:
+            return self.to_python(value)
         else:
             return None
 
+    def closed_form_synthesis(self, upper_bound, lower_bound, include_upper, include_lower, excluded):
+        """
+        Synthesize a value within the (consolidated) bounds that differs from all
+        values in excluded without starting Z3. Either bound can be None. Return
+        None if the shape of the constraints is not supported (or they conflict),
+        in which case the caller falls back to Z3. Subclasses override this
+        function for the types whose simple bounds can be solved directly.
+        """
+        return None
+
     @staticmethod
     @abstractmethod
     def simple_synthesis(value):
@@ -263,6 +444,14 @@ class Synthesizer(ABC):
         """Remove all constraints in the solver."""
         self.solver.reset()
 
+    def cache_key(self):
+        """
+        Identify synthesizers that produce the same value for the same constraints
+        (see SynthesisCache). Subclasses with parameters (e.g., the number of bits
+        or the character set) must include them.
+        """
+        return type(self),
+
     def splice_synthesis(self, constraints_list):
         """
         Splice deletion-by-synthesis should call this method to generate a new
@@ -272,14 +461,50 @@ class Synthesizer(ABC):
         generates a new value. If synthesis is unsuccessful for all sets, the caller
         then needs to make sure the object's trusted and synthesized flag are set
         properly (see middleware.py).
+
+        Results are memoized in synthesis_cache if the synthesizer has no constraints
+        of its own yet, so that the same constraints do not reach the solver twice.
         """
+        self.solve_time = 0.0
         if not constraints_list:
             return None
+        key = self._synthesis_cache_key(constraints_list)
+        if key is not None:
+            value = synthesis_cache.get(key)
+            if value is not SynthesisCache._MISSING:
+                if value is None:
+                    return None
+                return SpliceMixin.to_splice(value, False, True, empty_taint(), [])
+        # Each set of conjunctive constraints is solved in its own solver
+        # scope, so sets do not interfere with each other and the solver
+        # is left as it was (and can be reused, see pooled_synthesizer()).
+        total_solve_time = self.solver.total_solve_time
+        synthesized_value = None
         for constraints in constraints_list:
-            synthesized_value = self._splice_synthesis(constraints)
+            self.solver.push()
+            try:
+                synthesized_value = self._splice_synthesis(constraints)
+            finally:
+                self.solver.pop()
             if synthesized_value is not None:
-                return synthesized_value
-        return None
+                break
+        self.solve_time = self.solver.total_solve_time - total_solve_time
+        if key is not None:
+            synthesis_cache.put(key, None if synthesized_value is None else synthesized_value.unsplicify())
+        return synthesized_value
+
+    def _synthesis_cache_key(self, constraints_list):
+        """Return the synthesis_cache key of constraints_list, or None if the result must not be cached."""
+        # Constraints already in the solver would change the result.
+        if self.solver.assertions():
+            return None
+        try:
+            canonical = tuple(canonical_constraints(constraints) for constraints in constraints_list)
+        except TypeError:
+            return None
+        if None in canonical:
+            return None
+        return self.cache_key(), canonical
 
     def _splice_synthesis(self, constraints):
         """
@@ -313,8 +538,9 @@ class Synthesizer(ABC):
             # The one xeq constraint has two items, the first is the 'value' and the second is the 'fixed_length'.
             self.xeq_constraint(constraints['xeq'][0][0], constraints['xeq'][0][1], upper_bound, lower_bound)
 
-            if self.value is not None:
-                return self.to_python(self.value)
+            value = self.value
+            if value is not None:
+                return self.to_python(value)
             else:
                 return None
         #####################################################################################
@@ -353,6 +579,16 @@ class Synthesizer(ABC):
         elif 'ge' in cnts:
             lower_bound = cnts['ge']
             include_lower = True
+
+        # Simple bounds (without custom 'eq' functions) are solved in closed form if possible.
+        if self.closed_form and 'eq' not in constraints:
+            synthesized_value = self.closed_form_synthesis(upper_bound, lower_bound, include_upper,
+                                                           include_lower, constraints.get('ne', []))
+            if synthesized_value is not None:
+                synthesis_stats['closed_form'] += 1
+                return synthesized_value
+        synthesis_stats['solver'] += 1
+
         if upper_bound is not None and lower_bound is not None:
             self.bounded_constraints(upper_bound, lower_bound, include_upper, include_lower)
         else:
@@ -374,8 +610,9 @@ class Synthesizer(ABC):
             for constraint in constraints['ne']:
                 self.ne_constraint(constraint)
 
-        if self.value is not None:
-            return self.to_python(self.value)
+        value = self.value
+        if value is not None:
+            return self.to_python(value)
         else:
             return None
 
@@ -385,6 +622,35 @@ class IntSynthesizer(Synthesizer):
     def __init__(self):
         super().__init__(Int('var'))
 
+    def closed_form_synthesis(self, upper_bound, lower_bound, include_upper, include_lower, excluded):
+        """The midpoint of the interval (or the bound itself if it is one-sided), avoiding excluded values."""
+        upper_bound, lower_bound = _plain(upper_bound), _plain(lower_bound)
+        excluded = [_plain(v) for v in excluded]
+        if not all(_is_finite_number(v) for v in excluded + [upper_bound, lower_bound] if v is not None):
+            return None
+        lower, upper = None, None
+        if lower_bound is not None:
+            lower = math.ceil(lower_bound) if include_lower else math.floor(lower_bound) + 1
+        if upper_bound is not None:
+            upper = math.floor(upper_bound) if include_upper else math.ceil(upper_bound) - 1
+        if lower is not None and upper is not None:
+            if lower > upper:
+                return None
+            start = (lower + upper) // 2
+        elif lower is not None:
+            start = lower
+        elif upper is not None:
+            start = upper
+        else:
+            start = 0
+        # Each excluded value rules out at most one candidate.
+        for step in range(len(excluded) + 1):
+            for candidate in (start + step, start - step):
+                if (lower is None or candidate >= lower) and (upper is None or candidate <= upper) \
+                        and candidate not in excluded:
+                    return self.simple_synthesis(candidate)
+        return None
+
     @staticmethod
     def to_python(value):
         if value is not None:
@@ -407,14 +673,55 @@ class FloatSynthesizer(Synthesizer):
     def __init__(self):
         super().__init__(Real('var'))
 
+    @staticmethod
+    def to_float(value):
+        """Convert value (a bound of the synthesized value) to float."""
+        if not _is_finite_number(value):
+            raise TypeError("{value} is not a finite number.".format(value=value))
+        return float(value)
+
+    @staticmethod
+    def from_float(value):
+        """Convert a float to an untrusted, synthesized value."""
+        # Synthesized value needs no taint
+        return SpliceFloat(value, trusted=False, synthesized=True, taints=empty_taint())
+
+    def closed_form_synthesis(self, upper_bound, lower_bound, include_upper, include_lower, excluded):
+        """The midpoint of the interval (or one away from the bound if it is one-sided)."""
+        try:
+            upper = None if upper_bound is None else self.to_float(_plain(upper_bound))
+            lower = None if lower_bound is None else self.to_float(_plain(lower_bound))
+            excluded = [self.to_float(_plain(v)) for v in excluded]
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if lower is not None and upper is not None:
+            middle = lower / 2 + upper / 2
+            candidates = [middle, lower / 2 + middle / 2, middle / 2 + upper / 2]
+        elif lower is not None:
+            candidates = [lower + 1.0, lower + 2.0]
+        elif upper is not None:
+            candidates = [upper - 1.0, upper - 2.0]
+        else:
+            candidates = [0.0, 1.0]
+        for candidate in candidates:
+            try:
+                synthesized_value = self.from_float(candidate)
+            except (OverflowError, OSError, ValueError):
+                continue
+            # Converting from float may lose precision (e.g., datetime),
+            # so we check the value that is actually synthesized.
+            if _within_bounds(self.to_float(_plain(synthesized_value)), upper, lower,
+                              include_upper, include_lower, excluded):
+                return synthesized_value
+        return None
+
     @staticmethod
     def to_python(value):
         if value is not None:
             fraction_value = value.as_fraction()
             # Lose precision when casting into float
             float_value = float(fraction_value.numerator) / float(fraction_value.denominator)
-            # Synthesized value needs no taint
-            return SpliceFloat(float_value, trusted=False, synthesized=True, taints=empty_taint())
+            return FloatSynthesizer.from_float(float_value)
         else:
             return None
 
@@ -436,6 +743,9 @@ class BitVecSynthesizer(Synthesizer):
         """
         super().__init__(BitVec('b', bits))
 
+    def cache_key(self):
+        return type(self), self.var.size()
+
     @staticmethod
     def to_python(value):
         if value is not None:
@@ -480,6 +790,47 @@ class StrSynthesizer(Synthesizer):
             charset = self.DEFAULT_ASCII_CHARS
         self._charset = charset                                             # String representation
         self._chars = Union([Re(StringVal(c)) for c in self._charset])      # Z3 union representation
+        # Closed-form synthesis relies on charset being in lexicographic order
+        self._ordered_charset = list(self._charset) == sorted(self._charset)
+
+    def cache_key(self):
+        return type(self), tuple(self._charset)
+
+    def closed_form_synthesis(self, upper_bound, lower_bound, include_upper, include_lower, excluded):
+        """
+        The lexicographic successor of the lower bound (lower_bound + the smallest
+        character), a string that differs from the lower bound at the first position
+        where the bounds differ, or the predecessor of the upper bound (upper_bound
+        without its last character), whichever is within the bounds first.
+        """
+        if not self._ordered_charset:
+            return None
+        upper_bound, lower_bound = _plain(upper_bound), _plain(lower_bound)
+        excluded = [_plain(v) for v in excluded]
+        for value in excluded + [upper_bound, lower_bound]:
+            if value is not None and (not isinstance(value, str) or any(c not in self._charset for c in value)):
+                return None
+        smallest = self._charset[0]
+        candidates = []
+        if lower_bound is not None:
+            candidates.append(lower_bound + smallest)
+        if lower_bound is not None and upper_bound is not None:
+            pos = 0
+            while pos < min(len(lower_bound), len(upper_bound)) and lower_bound[pos] == upper_bound[pos]:
+                pos += 1
+            if pos < min(len(lower_bound), len(upper_bound)):
+                for c in self._charset:
+                    if lower_bound[pos] < c < upper_bound[pos]:
+                        candidates.append(lower_bound[:pos] + c)
+                        break
+        if upper_bound is not None:
+            candidates.append(upper_bound[:-1])
+        if lower_bound is None and upper_bound is None:
+            candidates.append(smallest)
+        for candidate in candidates:
+            if _within_bounds(candidate, upper_bound, lower_bound, include_upper, include_lower, excluded):
+                return self.simple_synthesis(candidate)
+        return None
 
     @property
     def value(self):
@@ -859,15 +1210,25 @@ class DatetimeSynthesizer(FloatSynthesizer):
     @staticmethod
     def to_float(value):
         """Convert value (a datetime object) to float."""
-        return value.timestamp()
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return FloatSynthesizer.to_float(value)
+
+    @staticmethod
+    def from_float(value):
+        """Convert value (a float object) to an untrusted datetime object."""
+        return DatetimeSynthesizer.to_python(value)
 
     @staticmethod
     def to_python(value):
         """Convert value (a float object) back to a
         datetime object and return an untrusted value."""
         if value is not None:
-            fraction_value = value.as_fraction()
-            float_value = float(fraction_value.numerator) / float(fraction_value.denominator)
+            if isinstance(value, float):
+                float_value = value
+            else:
+                fraction_value = value.as_fraction()
+                float_value = float(fraction_value.numerator) / float(fraction_value.denominator)
             dt = datetime.fromtimestamp(float_value)
             # Reconstruct an UntrustedDatetime object from a datetime
             # object requires an indirection (you cannot just pass in
@@ -951,6 +1312,26 @@ def init_synthesizer_on_type(v_type, vectorized=False):
                                   "{type}. Consider vectorization.".format(type=v_type))
 
 
+# Synthesizers (and their Z3 solvers) reused across
+# syntheses: (type, vectorized) -> Synthesizer
+_synthesizer_pool = dict()
+
+
+def pooled_synthesizer(v_type, vectorized=False):
+    """
+    Like init_synthesizer_on_type(), but return a synthesizer from a per-type
+    pool instead of creating a new one (and a new Z3 solver) every time. Use
+    a pooled synthesizer only through splice_synthesis(), which solves in its
+    own solver scope and leaves the solver without constraints when it returns.
+    """
+    key = (v_type, vectorized)
+    synthesizer = _synthesizer_pool.get(key)
+    if synthesizer is None:
+        synthesizer = init_synthesizer_on_type(v_type, vectorized)
+        _synthesizer_pool[key] = synthesizer
+    return synthesizer
+
+
 def int_synthesizer_test():
     synthesizer = IntSynthesizer()
     int_val = synthesizer.bounded_synthesis(upper_bound=92, lower_bound=7)
@@ -1097,8 +1478,92 @@ def bitvec_synthesizer_test():
     assert shr32(bitvec_val, n=2) == 0x3E345C
 
 
+def synthesis_cache_test():
+    synthesis_cache.clear()
+    constraints_list = [{'lt': [SpliceInt(34), 92], 'gt': [7]}]
+    int_val = IntSynthesizer().splice_synthesis(constraints_list)
+    assert 7 < int_val < 34, "{val} should be between 7 and 34, but it is not.".format(val=int_val)
+    assert synthesis_cache.misses == 1 and synthesis_cache.hits == 0
+    # The same (consolidated) constraints hit the cache and return a fresh object.
+    cached_val = IntSynthesizer().splice_synthesis([{'lt': [34], 'gt': [SpliceInt(7), 3]}])
+    assert cached_val == int_val and cached_val is not int_val
+    assert cached_val.synthesized and not cached_val.trusted and not cached_val.taints
+    assert synthesis_cache.misses == 1 and synthesis_cache.hits == 1
+    # Synthesizers of other types do not share results.
+    float_val = FloatSynthesizer().splice_synthesis(constraints_list)
+    assert isinstance(float_val, SpliceFloat)
+    assert synthesis_cache.misses == 2 and synthesis_cache.hits == 1
+    # 'ne' constraints are never cached.
+    IntSynthesizer().splice_synthesis([{'lt': [34], 'gt': [7], 'ne': [int_val]}])
+    assert synthesis_cache.misses == 2 and synthesis_cache.hits == 1
+    # Unsuccessful synthesis is cached as well.
+    assert IntSynthesizer().splice_synthesis([{'lt': [3], 'gt': [7]}]) is None
+    assert IntSynthesizer().splice_synthesis([{'lt': [3], 'gt': [7]}]) is None
+    assert synthesis_cache.misses == 3 and synthesis_cache.hits == 2
+    # Least recently used entries are evicted.
+    synthesis_cache.maxsize = 2
+    IntSynthesizer().splice_synthesis([{'lt': [100]}])
+    assert len(synthesis_cache) == 2
+    IntSynthesizer().splice_synthesis(constraints_list)
+    assert synthesis_cache.misses == 5
+    synthesis_cache.maxsize = 1024
+    synthesis_cache.clear()
+
+
+def scoped_solver_test():
+    solver = ScopedSolver()
+    x = Int('x')
+    solver.add(x > 1)
+    assert solver.check() == sat
+    total_solve_time = solver.total_solve_time
+    # The check result and the model are cached until constraints change.
+    assert solver.check() == sat and solver.model()[x].as_long() > 1
+    assert solver.total_solve_time == total_solve_time
+    solver.push()
+    solver.add(x < 0)
+    assert solver.check() != sat
+    assert solver.total_solve_time > total_solve_time
+    total_solve_time = solver.total_solve_time
+    # Popping a scope restores the result of the enclosing scope.
+    solver.pop()
+    assert solver.check() == sat
+    assert solver.total_solve_time == total_solve_time
+
+    synthesizer = pooled_synthesizer(SpliceInt)
+    assert synthesizer is pooled_synthesizer(SpliceInt)
+    # Each set of conjunctive constraints is solved on its own ('ne' bypasses the synthesis cache).
+    int_val = synthesizer.splice_synthesis([{'lt': [3], 'gt': [7]}, {'lt': [34], 'gt': [7], 'ne': [8]}])
+    assert 7 < int_val < 34 and int_val != 8, "{val} should be between 7 and 34 (but not 8).".format(val=int_val)
+    assert synthesizer.solve_time > 0
+    assert not synthesizer.solver.assertions()
+
+
+def closed_form_synthesis_test():
+    synthesis_cache.clear()
+    solver_count = synthesis_stats['solver']
+    int_val = IntSynthesizer().splice_synthesis([{'lt': [34, 92], 'gt': [7], 'ne': [20]}])
+    assert 7 < int_val < 34 and int_val != 20, "{val} should be between 7 and 34 (but not 20).".format(val=int_val)
+    float_val = FloatSynthesizer().splice_synthesis([{'le': [1.5], 'gt': [1.0]}])
+    assert 1.0 < float_val <= 1.5, "{val} should be between 1.0 and 1.5, but it is not.".format(val=float_val)
+    str_val = StrSynthesizer().splice_synthesis([{'lt': ['abd'], 'gt': ['abc']}])
+    assert 'abc' < str_val < 'abd', "{val} should be between 'abc' and 'abd', but it is not.".format(val=str_val)
+    str_val = StrSynthesizer().splice_synthesis([{'lt': ['Jack']}])
+    assert str_val < 'Jack', "{val} should be smaller than 'Jack', but it is not.".format(val=str_val)
+    lower, upper = datetime(2021, 1, 1), datetime(2021, 1, 2)
+    datetime_val = DatetimeSynthesizer().splice_synthesis([{'lt': [upper.timestamp()], 'gt': [lower.timestamp()]}])
+    assert lower < datetime_val < upper, "{val} should be on Jan 1 2021, but it is not.".format(val=datetime_val)
+    assert synthesis_stats['solver'] == solver_count
+    # Conflicting bounds and 'eq' functions go to Z3.
+    assert IntSynthesizer().splice_synthesis([{'lt': [6], 'gt': [5]}]) is None
+    assert synthesis_stats['solver'] == solver_count + 1
+    synthesis_cache.clear()
+
+
 if __name__ == "__main__":
     int_synthesizer_test()
     float_synthesizer_test()
     str_synthesizer_test()
     bitvec_synthesizer_test()
+    synthesis_cache_test()
+    scoped_solver_test()
+    closed_form_synthesis_test()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import copy
+import pickle
+import asyncio
+import logging
+
+from sstpd import deletion, replace
+from asyncio.splice.splicetypes import SpliceInt, SpliceStr, SpliceBytes, SpliceBytearray
+from asyncio.splice.registry import taint_registry
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def interval(obj, dg=False):
+    return [{'gt': [1000], 'lt': [2000]}]
+
+
+def run(job):
+    return asyncio.get_event_loop().run_until_complete(job.run())
+
+
+def audit_test(backend):
+    replace.set_backend(backend)
+    held = {'int': SpliceInt(1, trusted=False, taints=2, constraints=interval),
+            'list': [SpliceInt(i, trusted=False, taints=2, constraints=interval) for i in range(100)],
+            # A tuple cannot be redirected, but its item is flagged.
+            'tuple': (SpliceInt(3, trusted=False, taints=2, constraints=interval),),
+            'str': SpliceStr('user data', taints=2)}
+    job = deletion.DeletionJob(2, logging, audit=True)
+    stats = run(job)
+    print("%s: %s" % (backend, stats))
+    assert stats['synthesized'] == 102
+    assert stats['flagged'] == 1
+    assert stats['survivors'] == 0, job.survivors
+    assert 1000 < held['int'] < 2000 and held['int'].synthesized
+    assert all(1000 < value < 2000 for value in held['list'])
+    assert held['tuple'][0].synthesized and not held['tuple'][0].taints
+    assert held['str'].synthesized and not held['str'].taints
+
+
+def copy_test():
+    data = SpliceBytearray(b'user data', taints=4)
+    copies = [copy.copy(data), copy.deepcopy(data), pickle.loads(pickle.dumps(data))]
+    registered = {id(obj) for obj in taint_registry.objects(4)}
+    for obj in [data] + copies:
+        assert obj.taints == 4
+        assert id(obj) in registered
+    stats = run(deletion.DeletionJob(4, logging))
+    print("copies: %s" % stats)
+    assert stats['flagged'] == 4
+    for obj in [data] + copies:
+        assert obj.synthesized and not obj.taints
+
+
+def numpy_test():
+    ours = SpliceBytes(b'\x01\x02', taints=8).to_numpy()
+    theirs = SpliceBytes(b'\x03\x04', trusted=False, synthesized=True, taints=16).to_numpy()
+    for mixed in (ours + theirs, theirs + ours):
+        assert mixed.taints == 24 and not mixed.trusted and mixed.synthesized
+    derived = ours[1:] * 2
+    assert derived.taints == 8
+    registered = {id(obj) for obj in taint_registry.objects(8)}
+    assert id(ours) in registered and id(derived) in registered
+    stats = run(deletion.DeletionJob(8, logging))
+    print("arrays: %s" % stats)
+    assert ours.synthesized and not ours.taints
+    assert derived.synthesized and not derived.taints
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    for backend in replace.BACKENDS:
+        audit_test(backend)
+    copy_test()
+    if numpy is not None:
+        numpy_test()
+    deletion.shutdown_executor()
+
+if __name__ == '__main__':
+    main()